@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QDialog
 from control.HandleFunc import MainWindow
 from PyQt6.QtWidgets import QApplication
@@ -8,6 +9,8 @@ from service.ConfigManager import ConfigManager  # 新增导入
 # 注意修改./ui/picturetoolUI.py 文件中.ico的路径为 ./ 以main文件为起始地址
 # app.py
 if __name__ == '__main__':
+    # 打包成可执行文件后，批量统计的子进程需要它才能正常启动
+    multiprocessing.freeze_support()
     app = QApplication([])
     cm = ConfigManager()
     
@@ -2,12 +2,16 @@
 import warnings
 warnings.filterwarnings("ignore")
 from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QMainWindow,QDialog,QLabel
+from PyQt6.QtWidgets import QMainWindow,QDialog,QLabel,QCheckBox,QPushButton,QComboBox,QLineEdit,QInputDialog
 from ui.Ui_DataAnalysis import Ui_MainWindow
 from ui.Ui_folder import Ui_Dialog
 from service.FileManager import FileManager
 from service.Draw import Draw
-from PyQt6.QtCore import QTimer
+from service.BatchEngine import BatchEngine
+from service.TailFollower import TailFollower
+from service import CsvReader
+from PyQt6.QtCore import QTimer, QRect
+from PyQt6.QtGui import QActionGroup
 from datetime import datetime
 
 class MainWindow(QMainWindow):
@@ -17,6 +21,8 @@ class MainWindow(QMainWindow):
         self.main_ui.setupUi(self)
         self.file_manager = FileManager(self)
         self.draw = Draw(self)
+        # 文件夹批量统计引擎
+        self.batch_engine = BatchEngine(self)
         # 采集间隔
         # self.delt_T = 200
         self.delt_T_set = self.main_ui.doubleSpinBox_1.value()
@@ -29,6 +35,41 @@ class MainWindow(QMainWindow):
         self.main_ui.action_2.triggered.connect(self.open_folder_csv)
         self.main_ui.action_3.triggered.connect(self.draw.set_scatter_visible)
         self.main_ui.action_4.triggered.connect(self.draw.set_reference_line_visible)
+        # 紧凑存储（float32）和内存占用报告
+        self.action_compact = self.main_ui.menu_1.addAction("紧凑存储(float32)")
+        self.action_compact.setCheckable(True)
+        self.action_compact.toggled.connect(self.file_manager.set_compact)
+        self.action_memory = self.main_ui.menu_1.addAction("内存占用")
+        self.action_memory.triggered.connect(self.file_manager.memory_report)
+        # 解析引擎，同一时间只能选一个
+        self.menu_engine = self.main_ui.menu_0.addMenu("解析引擎")
+        self.engine_group = QActionGroup(self)
+        for engine in CsvReader.ENGINES:
+            action = self.menu_engine.addAction(engine)
+            action.setCheckable(True)
+            action.setChecked(engine == self.file_manager.engine)
+            action.triggered.connect(lambda checked, engine=engine: self.file_manager.set_engine(engine))
+            self.engine_group.addAction(action)
+        # 结果缓存：大小上限、淘汰策略、清空
+        self.menu_result_cache = self.main_ui.menu_0.addMenu("结果缓存")
+        self.menu_result_cache.addAction("大小上限...").triggered.connect(self.set_result_cache_limit)
+        self.policy_group = QActionGroup(self)
+        for policy, text in (("lru", "淘汰最久未使用(LRU)"), ("fifo", "淘汰最早写入(FIFO)")):
+            action = self.menu_result_cache.addAction(text)
+            action.setCheckable(True)
+            action.setChecked(policy == self.file_manager.result_cache.policy)
+            action.triggered.connect(lambda checked, policy=policy: self.file_manager.set_result_cache_policy(policy))
+            self.policy_group.addAction(action)
+        self.menu_result_cache.addAction("清空结果缓存").triggered.connect(self.file_manager.clear_result_cache)
+        # 导出报表默认保持完整精度，勾选后按表格的小数点精度四舍五入
+        self.action_export_rounding = self.main_ui.menu_0.addAction("导出时按显示精度舍入")
+        self.action_export_rounding.setCheckable(True)
+        self.action_export_rounding.toggled.connect(self.file_manager.set_export_rounding)
+        # 跟踪仍在写入的文件，只解析新追加的行
+        self.tail_follower = TailFollower(self)
+        self.action_follow = self.main_ui.menu_1.addAction("跟踪文件追加")
+        self.action_follow.setCheckable(True)
+        self.action_follow.toggled.connect(self.toggle_follow)
 
 
 
@@ -137,6 +178,7 @@ class MainWindow(QMainWindow):
         """打开子窗口，并确保它在主窗口之上"""
         self.folder = Folder()
         self.folder.main_ui.pushButton_1.clicked.connect(self.load_folder)
+        self.folder.pushButton_zip.clicked.connect(self.load_zip)
         self.folder.main_ui.pushButton_2.clicked.connect(self.cal_csv)
         self.folder.main_ui.spinBox_0.setValue(self.file_manager.header_threshold)  # 设置默认值
         self.folder.main_ui.spinBox_0.valueChanged.connect(lambda val: self.file_manager.change_header_threshold(val))
@@ -146,8 +188,18 @@ class MainWindow(QMainWindow):
         self.folder.raise_()  # 确保窗口在最前面
 
     def load_folder(self):
-        table_header = self.file_manager.load_folder()
+        self._set_folder_header(self.file_manager.load_folder())
+
+    def load_zip(self):
+        self._set_folder_header(self.file_manager.load_zip())
+
+    def _set_folder_header(self, table_header):
         self.folder.main_ui.comboBox_1.clear()
+        # 分组依据：第一个文件仪器信息中的字段
+        self.folder.comboBox_group.clear()
+        self.folder.comboBox_group.addItem("无")
+        if self.file_manager.folder_schema is not None:
+            self.folder.comboBox_group.addItems(self.file_manager.folder_schema.metadata.flat().keys())
         if table_header is None:
             return
         self.folder.main_ui.comboBox_1.addCheckableItems(table_header)
@@ -159,7 +211,7 @@ class MainWindow(QMainWindow):
             self.msg("未选择文件夹")
             return
         if not self.file_manager.csv_files:
-            self.msg(f"文件夹 {self.folder_path} 下没有 csv 文件")
+            self.msg(f"文件夹 {self.file_manager.folder_path} 下没有 csv 文件")
             return
         
         var_list = self.folder.main_ui.comboBox_1.checkedItems()
@@ -168,60 +220,74 @@ class MainWindow(QMainWindow):
             return
         
         cal_type = self.folder.main_ui.comboBox.currentText()
-        if cal_type == "平均值":
-            table_data =  {"文件名":[]}
-            for i in self.file_manager.csv_files:
-                try:
-                    df = self.file_manager.load_file(self.file_manager.folder_path + "/" + i)
-                    table_data["文件名"].append(i)
-                    for var in var_list:
-                        if not table_data.get(f"{var} 平均值"):
-                            table_data[f"{var} 平均值"] = []
-                        table_data[f"{var} 平均值"].append(self.draw.data_analysis.cal_csv_avg(df,var))
-                except Exception as e:
-                    self.msg(f"文件 {i} 加载失败,失败原因 {e} ")
-                    continue
-            self.draw.report_table.update_csv_table(table_data)
-        elif cal_type == "最大值":
-            table_data =  {"文件名":[]}
-            for i in self.file_manager.csv_files:
-                try:
-                    df = self.file_manager.load_file(self.file_manager.folder_path + "/" + i)
-                    table_data["文件名"].append(i)
-                    for var in var_list:
-                        if not table_data.get(f"{var} 最大值"):
-                            table_data[f"{var} 最大值"] = []
-                        if not table_data.get(f"{var} 最大值索引"):
-                            table_data[f"{var} 最大值索引"] = []
-                        max,idx = self.draw.data_analysis.cal_csv_max(df,var)
-                        table_data[f"{var} 最大值"].append(max)
-                        table_data[f"{var} 最大值索引"].append(idx)
-                except Exception as e:
-                    self.msg(f"文件 {i} 加载失败,失败原因 {e} ")
-                    continue
-            self.draw.report_table.update_csv_table(table_data)
-            
-        elif cal_type == "最小值":
-            table_data =  {"文件名":[]}
-            table_data =  {"文件名":[]}
-            for i in self.file_manager.csv_files:
-                try:
-                    df = self.file_manager.load_file(self.file_manager.folder_path + "/" + i)
-                    table_data["文件名"].append(i)
-                    for var in var_list:
-                        if not table_data.get(f"{var} 最小值"):
-                            table_data[f"{var} 最小值"] = []
-                        if not table_data.get(f"{var} 最小值索引"):
-                            table_data[f"{var} 最小值索引"] = []
-                        min,idx = self.draw.data_analysis.cal_csv_min(df,var)
-                        table_data[f"{var} 最小值"].append(min)
-                        table_data[f"{var} 最小值索引"].append(idx)
-                except Exception as e:
-                    self.msg(f"文件 {i} 加载失败,失败原因 {e} ")
-                    continue
-            self.draw.report_table.update_csv_table(table_data)
-
-
+        # 每个文件的统计在进程池中并行执行，结果完成一个刷新一次表格
+        csv_files = self.file_manager.csv_files
+        csv_paths = [self.file_manager.csv_path(i) for i in csv_files]
+        cache_dir = self.file_manager.csv_cache.cache_dir if self.file_manager.cache_enabled else None
+        # 按仪器信息分组/筛选：仪器信息直接取自文件夹索引，不读取文件
+        group_key = self.folder.comboBox_group.currentText()
+        group_values = None
+        if group_key and group_key != "无":
+            group_values = []
+            for name in csv_files:
+                schema = self.file_manager.folder_file_schema(name)
+                group_values.append(schema.metadata.flat().get(group_key, "") if schema is not None else "")
+            filter_text = self.folder.lineEdit_filter.text().strip()
+            if filter_text:
+                kept = [i for i, value in enumerate(group_values) if filter_text in value]
+                csv_paths = [csv_paths[i] for i in kept]
+                group_values = [group_values[i] for i in kept]
+                self.msg(f"按 {group_key} 包含 “{filter_text}” 筛选后剩余 {len(csv_paths)} 个文件")
+                if not csv_paths:
+                    return
+        else:
+            group_key = None
+        self.batch_engine.start(csv_paths,
+                                var_list,
+                                cal_type,
+                                self.file_manager.load_options(),
+                                cache_dir,
+                                self.folder.checkBox_moments.isChecked(),
+                                on_update=self.draw.report_table.update_csv_table,
+                                parent=self.folder,
+                                group_key=group_key,
+                                group_values=group_values,
+                                folder_index=self.file_manager.folder_index,
+                                result_cache=self.file_manager.result_cache
+                                if self.file_manager.result_cache_enabled else None)
+
+
+
+    def set_result_cache_limit(self):
+        current = self.file_manager.result_cache.max_bytes // 1024 ** 2
+        megabytes, ok = QInputDialog.getInt(self, "结果缓存", "大小上限（MB）：", current, 1, 1024 * 1024)
+        if ok:
+            self.file_manager.set_result_cache_limit(megabytes)
+
+    def toggle_follow(self, checked):
+        """开启/关闭跟踪模式，开启失败时取消勾选"""
+        if not checked:
+            self.tail_follower.stop()
+            return
+        started = self.tail_follower.start(self.file_manager.current_file,
+                                           self.file_manager.schema,
+                                           self.draw.data_analysis.store,
+                                           self.file_manager.load_options())
+        if not started:
+            self.action_follow.setChecked(False)
+
+    def apply_metadata(self, metadata):
+        """根据文件中的仪器信息自动设置参数，目前是采样间隔 ΔT（Update Rate）"""
+        update_rate = metadata.update_rate
+        if update_rate is None:
+            return
+        # 采样间隔小于当前显示精度时增加小数位
+        decimals = self.main_ui.doubleSpinBox_1.decimals()
+        while decimals < 6 and round(update_rate, decimals) != update_rate:
+            decimals += 1
+        self.main_ui.doubleSpinBox_1.setDecimals(decimals)
+        self.main_ui.doubleSpinBox_1.setValue(update_rate)
+        self.msg(f"根据仪器 {metadata.model or ''} 的 Update Rate 自动设置 ΔT = {update_rate:g} s")
 
     def on_doubleSpinBox_1_valueChanged(self):
         self.delt_T_set = self.main_ui.doubleSpinBox_1.value()
@@ -234,13 +300,29 @@ class MainWindow(QMainWindow):
         """示例：显示索引 * self.delt_T_set"""
         return f"{int(value * self.delt_T_set)}"
 
+    def _elapsed_time_formatter(self, value, pos):
+        """显示文件时间戳对应的真实时间（相对第一个点，秒）"""
+        elapsed = self.draw.data_analysis.get_elapsed_time()
+        if elapsed is None:
+            # 重新加载了没有时间戳的文件
+            return self._scaled_index_formatter(value, pos)
+        index = min(max(int(round(value)), 0), len(elapsed) - 1)
+        return f"{int(elapsed[index])}"
+
     def changeDeltT(self):
         if self.main_ui.checkBox_3.isChecked():
             self.main_ui.doubleSpinBox_1.setEnabled(False)
-            self.draw.update_x_formatter(self._scaled_index_formatter)
+            # 文件带有 Date/Time/MilliSecond 时间戳时使用真实时间，否则使用 数据点位 * ΔT
+            elapsed = self.draw.data_analysis.get_elapsed_time()
+            if elapsed is not None:
+                self.msg("使用文件中的时间戳作为时间轴")
+                self.draw.update_x_formatter(self._elapsed_time_formatter)
+            else:
+                self.draw.update_x_formatter(self._scaled_index_formatter)
             # 设置所有散点图中斜率的delt_T_set
             for scatter in self.draw.scatter_manager.values():
                 scatter.delt_T = self.delt_T_set
+                scatter.time_axis = elapsed
             # 设置y轴标签，在右下角
             xlabel = self.draw.canvas.ax_left.set_xlabel("T[s]", labelpad=0.1)
             xlabel.set_horizontalalignment("right")
@@ -251,6 +333,7 @@ class MainWindow(QMainWindow):
             # 设置所有散点图中斜率的delt_T_set
             for scatter in self.draw.scatter_manager.values():
                 scatter.delt_T = 1
+                scatter.time_axis = None
             # xlabel 设置为空，不显示
             self.draw.canvas.ax_left.set_xlabel("数据点位")
 
@@ -436,7 +519,27 @@ class Folder(QDialog):
         self.main_ui = Ui_Dialog()
         self.main_ui.setupUi(self)
         self.main_ui.comboBox.clear()
-        self.main_ui.comboBox.addItems(["平均值", "最大值", "最小值"])
+        # “全部”在一次读取中同时给出平均值、最大值、最小值及其索引
+        self.main_ui.comboBox.addItems(["全部", "平均值", "最大值", "最小值"])
+        # 勾选后每个变量额外输出标准差和均方根
+        self.checkBox_moments = QCheckBox("标准差/均方根", parent=self)
+        self.checkBox_moments.setGeometry(QRect(400, 90, 161, 31))
+        self.checkBox_moments.setFont(self.main_ui.comboBox.font())
+        # 直接选择 zip 压缩包，不需要先解压
+        self.pushButton_zip = QPushButton("选择压缩包", parent=self)
+        self.pushButton_zip.setGeometry(QRect(400, 10, 161, 31))
+        # 按仪器信息（Model、Update Rate 等）分组或筛选文件
+        self.setFixedSize(576, 181)
+        self.label_group = QLabel("分组依据：", parent=self)
+        self.label_group.setGeometry(QRect(10, 130, 91, 31))
+        self.label_group.setFont(self.main_ui.label_2.font())
+        self.comboBox_group = QComboBox(parent=self)
+        self.comboBox_group.setGeometry(QRect(100, 130, 121, 31))
+        self.comboBox_group.setFont(self.main_ui.comboBox.font())
+        self.comboBox_group.addItem("无")
+        self.lineEdit_filter = QLineEdit(parent=self)
+        self.lineEdit_filter.setGeometry(QRect(230, 130, 161, 31))
+        self.lineEdit_filter.setPlaceholderText("筛选值（可选）")
 
         # 设置窗口始终保持在前
         self.setWindowFlags(Qt.WindowType.WindowStaysOnTopHint)
@@ -0,0 +1,185 @@
+# BatchEngine.py
+# 文件夹批量统计引擎：每个文件的统计放到进程池中并行执行，结果按完成顺序流式刷新到表格
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtWidgets import QProgressDialog
+from service import BatchTask, CsvReader
+
+
+class BatchEngine:
+    """
+    进程池大小默认等于 CPU 核数。主线程用 QTimer 轮询已完成的任务，
+    不阻塞界面；进度对话框上的“取消”按钮会丢弃尚未开始的任务。
+    单个文件失败不会中断整批统计，失败原因汇总在 failures 中，结束时统一输出。
+    """
+    POLL_INTERVAL = 100  # 轮询间隔，毫秒
+
+    def __init__(self, main_window, max_workers=None):
+        self.main_window = main_window
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self.futures = {}
+        self.files = []
+        self.sizes = []
+        self.engine = None
+        self.group_key = None
+        self.group_values = None
+        self.results = {}
+        self.digests = {}
+        self.failures = []
+        # 文件夹索引和本次统计参数对应的键，cached 为直接取自索引的文件下标
+        self.folder_index = None
+        self.stats_key = None
+        self.cached = set()
+        self.progress = None
+        self.on_update = None
+        self.start_time = 0
+        self.timer = QTimer()
+        self.timer.timeout.connect(self._poll)
+
+    @property
+    def running(self) -> bool:
+        return self.executor is not None
+
+    def start(self, csv_paths: list, var_list: list, cal_type: str, options, cache_dir=None, moments=False,
+              on_update=None, parent=None, group_key=None, group_values=None, folder_index=None,
+              result_cache=None):
+        """
+        提交一批文件。on_update(table_data) 在每次有新结果时调用，
+        table_data 为 {"文件名": [...], 列名: [...]}，行顺序与 csv_paths 一致（只包含已完成且成功的文件）。
+        传入 group_key 和每个文件对应的 group_values 时，结果表在文件名后增加该列，并按分组排序。
+        传入 FolderIndex 时，内容没有变化且统计参数相同的文件直接使用索引中保存的结果，不再提交计算，
+        新算出的结果在结束时写回索引。
+        传入 ResultCache 时子进程按文件内容哈希查找结果，其他文件夹中内容相同的文件也不再解析。
+        """
+        if self.running:
+            self.main_window.msg("批量统计正在进行中")
+            return
+        self.files = list(csv_paths)
+        # 文件大小和实际使用的解析引擎，结束时输出吞吐量
+        self.sizes = [self._source_size(path) for path in self.files]
+        self.engine = CsvReader.resolve_engine(options.engine)
+        self.group_key = group_key
+        self.group_values = list(group_values) if group_values is not None else None
+        self.results = {}
+        # 子进程算出的内容哈希，结束时与统计结果一起写回文件夹索引
+        self.digests = {}
+        self.failures = []
+        self.on_update = on_update
+        self.start_time = time.perf_counter()
+        self.folder_index = folder_index
+        self.stats_key = None
+        self.cached = set()
+        if folder_index is not None:
+            self.stats_key = folder_index.stats_key(var_list, cal_type, moments, options)
+            for index, path in enumerate(self.files):
+                row = folder_index.cached_stats(path, self.stats_key)
+                if row is not None:
+                    self.results[index] = row
+                    self.cached.add(index)
+        pending = [index for index in range(len(self.files)) if index not in self.cached]
+        self.executor = ProcessPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending))))
+        self.futures = {self.executor.submit(BatchTask.file_stats, self.files[index], var_list, cal_type, options,
+                                              cache_dir, moments,
+                                              result_cache=result_cache,
+                                              digest=self._digest(self.files[index])): index
+                        for index in pending}
+
+        self.progress = QProgressDialog(f"正在统计 {len(self.files)} 个文件...", "取消", 0, len(self.files), parent)
+        self.progress.setWindowTitle("批量统计")
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress.setMinimumDuration(0)
+        self.progress.setAutoClose(False)
+        self.progress.canceled.connect(self.cancel)
+        self.progress.setValue(len(self.cached))
+        if self.cached and self.on_update is not None:
+            self.on_update(self.table_data())
+        self.timer.start(self.POLL_INTERVAL)
+
+    def _digest(self, csv_path):
+        """文件夹索引中已经算过的内容哈希，没有时由子进程自己计算"""
+        if self.folder_index is None:
+            return None
+        return self.folder_index.content_digest(csv_path)
+
+    @staticmethod
+    def _source_size(csv_path):
+        try:
+            return CsvReader.stat_source(csv_path)[0]
+        except (OSError, KeyError, zipfile.BadZipFile):
+            # 读取失败的文件会在子进程中报错，这里只是不计入吞吐量
+            return 0
+
+    def _poll(self):
+        done = [future for future in self.futures if future.done()]
+        for future in done:
+            index = self.futures.pop(future)
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                self.failures.append((os.path.basename(self.files[index]), f"{type(error).__name__}: {error}"))
+            else:
+                self.results[index], self.digests[index] = future.result()
+        if done:
+            self.progress.setValue(len(self.files) - len(self.futures))
+            if self.on_update is not None and self.results:
+                self.on_update(self.table_data())
+        if not self.futures:
+            self._finish(cancelled=False)
+
+    def table_data(self) -> dict:
+        """把已完成的结果按文件顺序整理成表格数据"""
+        table_data = {"文件名": []}
+        order = sorted(self.results)
+        if self.group_key is not None:
+            table_data[self.group_key] = []
+            order.sort(key=lambda index: self.group_values[index])
+        for index in order:
+            table_data["文件名"].append(self._display_name(self.files[index]))
+            if self.group_key is not None:
+                table_data[self.group_key].append(self.group_values[index])
+            for key, value in self.results[index].items():
+                table_data.setdefault(key, []).append(value)
+        return table_data
+
+    def _display_name(self, csv_path):
+        """结果表中的文件名：有文件夹索引时用相对路径（子文件夹中可能有同名文件）"""
+        if self.folder_index is not None:
+            return self.folder_index.relative_path(csv_path)
+        return os.path.basename(csv_path)
+
+    def cancel(self):
+        """取消尚未开始的任务，正在执行的任务结束后结果被丢弃"""
+        if not self.running:
+            return
+        for future in self.futures:
+            future.cancel()
+        self.futures.clear()
+        self._finish(cancelled=True)
+
+    def _finish(self, cancelled):
+        self.timer.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.progress.canceled.disconnect(self.cancel)
+        self.progress.close()
+        self.progress = None
+        elapsed = time.perf_counter() - self.start_time
+        state = "已取消" if cancelled else "完成"
+        self.main_window.msg(f"批量统计{state}：成功 {len(self.results)} 个（其中 {len(self.cached)} 个取自文件夹索引），"
+                             f"失败 {len(self.failures)} 个，共 {len(self.files)} 个文件，用时 {elapsed:.1f} s")
+        if self.folder_index is not None:
+            for index, row in self.results.items():
+                if index not in self.cached:
+                    self.folder_index.store_stats(self.files[index], self.stats_key, row, self.digests.get(index))
+            self.folder_index.save()
+        data_bytes = sum(self.sizes[index] for index in self.results if index not in self.cached)
+        speed = data_bytes / 1024 ** 2 / elapsed if elapsed > 0 else float('inf')
+        self.main_window.msg(f"解析引擎：{self.engine}，处理 {data_bytes / 1024 ** 2:.1f} MB，{speed:.1f} MB/s")
+        if self.failures:
+            details = "；".join(f"{name}（{reason}）" for name, reason in self.failures)
+            self.main_window.msg(f"失败文件：{details}")
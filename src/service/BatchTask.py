@@ -0,0 +1,99 @@
+# BatchTask.py
+# 批量统计中单个文件的计算任务，在进程池的子进程中执行，不依赖界面
+import numpy as np
+from service import CsvReader, Stats
+from service.CsvCache import CsvCache
+from service.CsvLoader import LoadOptions, column_key, load_schema
+from service.ResultCache import ResultCache, analysis_params
+
+# 每种统计类型在结果表中对应的列（列名为 "变量 统计项"）
+STAT_FIELDS = {
+    "全部": ("平均值", "最大值", "最大值索引", "最小值", "最小值索引"),
+    "平均值": ("平均值",),
+    "最大值": ("最大值", "最大值索引"),
+    "最小值": ("最小值", "最小值索引"),
+}
+# 勾选“标准差/均方根”时追加的列
+MOMENT_FIELDS = ("标准差", "均方根")
+
+
+def _array_blocks(arrays, chunk_rows):
+    """把若干等长的一维数组（可以是 memmap）按行切块，每次只拷贝一块"""
+    length = len(arrays[0])
+    for start in range(0, length, chunk_rows):
+        yield np.column_stack([a[start:start + chunk_rows] for a in arrays])
+
+
+def _iter_blocks(csv_path, schema, entry, positions, options: LoadOptions, cache, chunk_rows):
+    """所选列都已在磁盘缓存中时分块读取缓存，否则从表头开始分块解析 CSV（只解析所选列）"""
+    if cache is not None:
+        arrays = [cache.load_column(entry, column_key(position, options)) for position in positions]
+        if all(a is not None for a in arrays):
+            yield from _array_blocks(arrays, chunk_rows)
+            return
+    yield from CsvReader.iter_numeric_chunks(csv_path, schema, options.engine, chunk_rows, positions)
+
+
+def _field_value(stats: Stats.StreamStats, i, name):
+    if name == "平均值":
+        return stats.mean(i)
+    if name == "标准差":
+        return stats.std(i)
+    if name == "均方根":
+        return stats.rms(i)
+    max_value, max_index, min_value, min_index = stats.max_min(i)
+    return {"最大值": max_value, "最大值索引": max_index, "最小值": min_value, "最小值索引": min_index}[name]
+
+
+def file_stats(csv_path, var_list, cal_type, options: LoadOptions, cache_dir=None, moments=False,
+               chunk_rows=CsvReader.DEFAULT_CHUNK_ROWS, result_cache: ResultCache = None, digest=None) -> tuple:
+    """
+    统计一个文件中所选变量的统计量，返回 ({列名: 值}, 内容哈希)，列顺序与结果表一致。
+    cal_type 为 STAT_FIELDS 中的一种，"全部" 一次给出均值、最大值及索引、最小值及索引；
+    moments=True 时每个变量再追加标准差和均方根。
+    表头之后按 chunk_rows 行一块流式读取，所有变量的全部统计量在同一遍扫描中累积，
+    内存占用与文件大小无关。cache_dir 不为空时与界面共用磁盘缓存。
+    传入 result_cache 时先按文件内容哈希（digest，未给出时现算）和统计参数查找结果，
+    内容相同的文件（其他文件夹中的拷贝）不再解析；不使用结果缓存时不计算哈希，返回的哈希为 None。
+    失败时直接抛出异常，由调用方收集。
+    """
+    if cal_type not in STAT_FIELDS:
+        raise ValueError(f"未知的统计类型 {cal_type}")
+    params = None
+    if result_cache is not None:
+        digest = digest or CsvReader.content_hash(csv_path)
+        params = analysis_params("batch", digest, options,
+                                 vars=list(var_list), stat=cal_type, moments=bool(moments))
+        row = result_cache.get(params)
+        if row is not None:
+            return row, digest
+    fields = STAT_FIELDS[cal_type] + (MOMENT_FIELDS if moments else ())
+    cache = CsvCache(cache_dir) if cache_dir else None
+    loaded = load_schema(csv_path, options, cache)
+    if loaded is None:
+        raise ValueError("未找到稳定的表头行，请修改检测阈值")
+    schema, entry = loaded
+    positions = dict(zip(schema.numeric_columns, schema.numeric))
+    for var in var_list:
+        if var not in positions:
+            raise KeyError(f"没有变量 {var}")
+    selected = [positions[var] for var in var_list]
+
+    stats = Stats.StreamStats(len(selected), moments)
+    try:
+        for block in _iter_blocks(csv_path, schema, entry, selected, options, cache, chunk_rows):
+            stats.update(block)
+    except ValueError:
+        # 探测行之后出现了非数值内容，逐列解析（无法转换的单元格记为 NaN）后再统计
+        arrays = [CsvReader.read_column(csv_path, schema, position, options.engine) for position in selected]
+        stats = Stats.StreamStats(len(selected), moments)
+        for block in _array_blocks(arrays, chunk_rows):
+            stats.update(block)
+
+    row = {}
+    for i, var in enumerate(var_list):
+        for name in fields:
+            row[f"{var} {name}"] = _field_value(stats, i, name)
+    if result_cache is not None:
+        result_cache.put(params, row)
+    return row, digest
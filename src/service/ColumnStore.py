@@ -0,0 +1,140 @@
+# ColumnStore.py
+# 按列存放数值数据，每列是一个一维 numpy 数组（可以是 numpy.memmap）
+import numpy as np
+
+
+class ColumnStore:
+    """
+    列式数据容器，替代整张 pandas DataFrame。
+    每列都是独立的一维数组；当数组是 numpy.memmap 时，只有真正被访问的列/区间才会被读入内存。
+    传入 loader 时为惰性模式：列在第一次被访问时才调用 loader(列名) 解析，之后缓存在 store 中。
+    time_loader() 返回 int64 纳秒时间戳数组（没有时间列时返回 None），同样在第一次访问时才解析。
+    行号即数组下标，从 0 开始连续编号。
+    append() 在末尾追加新行（跟踪仍在写入的文件），追加的列放在按倍数扩容的缓冲区中，均摊开销只与新行数有关。
+    """
+    def __init__(self, columns: list, arrays: dict, length: int = None, loader=None, time_loader=None):
+        self._columns = list(columns)
+        self._arrays = arrays
+        self._loader = loader
+        self._time_loader = time_loader
+        self._timestamps = None
+        self._timestamps_loaded = time_loader is None
+        # 追加行时使用的缓冲区，容量大于当前行数，_arrays 中保存的是它的前缀视图
+        self._buffers = {}
+        if length is None and arrays:
+            length = len(next(iter(arrays.values())))
+        elif length is None and not self._columns:
+            length = 0
+        self._length = length
+
+    @classmethod
+    def from_frame(cls, df):
+        """由 DataFrame 构造，列数组直接引用 DataFrame 的数据"""
+        columns = df.columns.tolist()
+        arrays = {col: np.ascontiguousarray(df.iloc[:, i].values, dtype=np.float64) for i, col in enumerate(columns)}
+        return cls(columns, arrays, len(df))
+
+    @property
+    def columns(self) -> list:
+        return self._columns
+
+    @property
+    def loaded(self) -> list:
+        """已经解析到内存（或已映射）的列"""
+        return [col for col in self._columns if col in self._arrays]
+
+    def __len__(self):
+        if self._length is None:
+            # 惰性模式下还没有任何列被加载，加载第一列得到行数
+            self[self._columns[0]]
+        return self._length
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name) -> np.ndarray:
+        values = self._arrays.get(name)
+        if values is None:
+            if self._loader is None or name not in self._columns:
+                raise KeyError(name)
+            values = self._loader(name)
+            if self._length is None:
+                self._length = len(values)
+            # 追加过行之后文件可能又变长了，只取与其他列对齐的部分
+            values = values[:self._length]
+            self._arrays[name] = values
+        return values
+
+    def set_loader(self, loader, time_loader=None):
+        """替换尚未加载的列（和时间戳）的加载函数，加载结果超出当前行数的部分会被截掉"""
+        self._loader = loader
+        if time_loader is not None:
+            self._time_loader = time_loader
+
+    @property
+    def timestamps_loaded(self) -> bool:
+        return self._timestamps_loaded
+
+    def append(self, arrays: dict, timestamps=None):
+        """
+        在末尾追加新行。arrays 必须包含所有已加载的列（{列名: 一维数组}），长度一致；
+        未加载的列保持惰性，之后加载时按当前行数截取。
+        时间戳已加载时需要同时给出新行的时间戳，否则时间戳失效（记为 None）。
+        """
+        if set(arrays) != set(self.loaded):
+            raise ValueError("追加的列与已加载的列不一致")
+        n = len(self)
+        added = len(next(iter(arrays.values()))) if arrays else 0
+        for name, values in arrays.items():
+            self._arrays[name] = self._extend(name, self._arrays[name], values)
+        if self._timestamps_loaded and self._timestamps is not None:
+            self._timestamps = None if timestamps is None else self._extend(None, self._timestamps, timestamps)
+        self._length = n + added
+
+    def truncate(self, rows):
+        """只保留前 rows 行（跟踪文件时丢掉加载时还没写完的最后一行）"""
+        for name in self.loaded:
+            self._arrays[name] = self._arrays[name][:rows]
+        if self._timestamps is not None:
+            self._timestamps = self._timestamps[:rows]
+        elif self._time_loader is not None:
+            # 没写完的最后一行可能导致时间戳解析失败，下次访问时重新解析
+            self._timestamps_loaded = False
+        self._length = rows
+
+    def _extend(self, key, current, values):
+        buffer = self._buffers.get(key)
+        n = len(current)
+        if buffer is None or len(buffer) < n + len(values):
+            # 容量不够时按两倍扩容（memmap 在这里被复制到内存）
+            buffer = np.empty(max(n + len(values), 2 * n, 1024), dtype=current.dtype)
+            buffer[:n] = current
+            self._buffers[key] = buffer
+        buffer[n:n + len(values)] = values
+        return buffer[:n + len(values)]
+
+    @property
+    def timestamps(self):
+        """每行的时间戳（int64，纳秒），没有时间列时为 None"""
+        if not self._timestamps_loaded:
+            self._timestamps = self._time_loader()
+            if self._timestamps is not None and self._length is not None:
+                self._timestamps = self._timestamps[:self._length]
+            self._timestamps_loaded = True
+        return self._timestamps
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self._arrays.values())
+
+    def memory_report(self) -> str:
+        """已加载列的内存占用，以及相对 float64 存储节省的大小"""
+        loaded = self.loaded
+        if not loaded:
+            return "尚未加载任何列"
+        full = sum(len(self._arrays[col]) * 8 for col in loaded)
+        used = self.nbytes
+        dtypes = "/".join(sorted({self._arrays[col].dtype.name for col in loaded}))
+        return (f"已加载 {len(loaded)}/{len(self._columns)} 列（{dtypes}），"
+                f"占用 {used / 1024 ** 2:.1f} MB，float64 需要 {full / 1024 ** 2:.1f} MB，"
+                f"节省 {(full - used) / 1024 ** 2:.1f} MB")
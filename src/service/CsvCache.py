@@ -0,0 +1,143 @@
+# CsvCache.py
+# CSV 解析结果的磁盘列式缓存：每列一个 .npy 文件 + 一个 schema.json
+# 列按需写入，读取时以 numpy.memmap 方式打开，只有被访问到的列才会真正读入内存
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from service import CsvReader
+from service.CsvReader import CsvSchema
+
+SCHEMA_FILE = "schema.json"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 缓存总大小上限 2 GB
+
+
+def default_cache_dir():
+    """缓存目录，与 ConfigManager 一样放在 APPDATA/DataAna 下"""
+    base = os.getenv('APPDATA') or os.path.expanduser('~')
+    return os.path.join(base, "DataAna", "cache")
+
+
+class CsvCache:
+    """
+    按 (路径, 文件大小, 修改时间, 表头探测参数, 解析引擎) 缓存 CSV 的表头结构和已解析的列，
+    表头探测参数即 CsvLoader.probe_signature，与文件夹索引、结果缓存一致。
+    源文件只要被修改（大小或 mtime 变化），缓存键随之变化，旧条目会被 LRU 淘汰。
+    一个条目对应一个目录：schema.json 记录表头结构和仪器信息，c<列位置>.npy 是已经解析过的列（时间戳为 cts.npy）。
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _source_info(self, csv_path, signature, engine):
+        size, mtime_ns = CsvReader.stat_source(csv_path)
+        archive, member = CsvReader.split_source(csv_path)
+        path = os.path.abspath(archive)
+        return {
+            "path": path if member is None else CsvReader.zip_member_path(path, member),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "header": list(signature),
+            "engine": engine,
+        }
+
+    def entry(self, csv_path, signature, engine):
+        """返回 (条目目录, 源文件信息)，signature 为 CsvLoader.probe_signature 的结果，条目目录不一定已经存在"""
+        source = self._source_info(csv_path, signature, engine)
+        key = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key), source
+
+    def load_schema(self, entry, source):
+        """读取条目中的表头结构，未命中或条目损坏返回 None"""
+        schema_path = os.path.join(entry, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            return None
+        try:
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data["source"] != source:
+                raise ValueError("缓存键冲突")
+            schema = CsvSchema.from_dict(data)
+        except (OSError, ValueError, KeyError):
+            # 条目损坏或格式过旧，删除后重新生成
+            self._remove_entry(entry)
+            return None
+        # 更新访问时间，用于 LRU 淘汰
+        os.utime(entry)
+        return schema
+
+    def save_schema(self, entry, source, schema: CsvSchema):
+        """新建条目并写入表头结构，之前残留的同名条目会被清掉"""
+        self._remove_entry(entry)
+        os.makedirs(entry, exist_ok=True)
+        data = {"source": source, **schema.to_dict()}
+        tmp = os.path.join(entry, f"{SCHEMA_FILE}.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(entry, SCHEMA_FILE))
+        self.evict()
+
+    def load_column(self, entry, position):
+        """以 memmap 方式打开已缓存的列，没有缓存返回 None。position 是列位置，也可以是字符串键"""
+        path = os.path.join(entry, f"c{position}.npy")
+        if not os.path.exists(path):
+            return None
+        try:
+            values = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)
+        return values
+
+    def save_column(self, entry, position, values: np.ndarray):
+        """
+        把解析好的列写入条目，返回以 memmap 方式重新打开的数组。
+        条目已经不存在（被淘汰或清空）时不写入，直接返回原数组。
+        """
+        if not os.path.exists(os.path.join(entry, SCHEMA_FILE)):
+            return values
+        path = os.path.join(entry, f"c{position}.npy")
+        # 先写临时文件再改名，避免其他进程读到写了一半的列
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return values
+        self.evict()
+        cached = self.load_column(entry, position)
+        return values if cached is None else cached
+
+    def _remove_entry(self, entry):
+        """先删除 schema.json 使条目失效，再删除列文件"""
+        try:
+            os.remove(os.path.join(entry, SCHEMA_FILE))
+        except OSError:
+            pass
+        shutil.rmtree(entry, ignore_errors=True)
+
+    def evict(self):
+        """总大小超过上限时，按最近访问时间从旧到新删除条目"""
+        entries = []
+        total = 0
+        for item in os.scandir(self.cache_dir):
+            if not item.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(item.path) if f.is_file())
+            entries.append((item.stat().st_mtime, size, item.path))
+            total += size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove_entry(path)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
@@ -0,0 +1,114 @@
+# CsvLoader.py
+# 与界面无关的 CSV 加载入口，FileManager 和批量统计的子进程共用
+import time
+from dataclasses import dataclass
+import numpy as np
+from service import CsvReader
+from service.ColumnStore import ColumnStore
+
+# 时间戳在磁盘缓存中的列名（数值列用文件中的位置下标）
+TIMESTAMP_KEY = "ts"
+
+
+@dataclass
+class LoadOptions:
+    """CSV 加载参数，可以被 pickle 传给子进程
+
+    Attributes:
+        header_threshold: 表头检测阈值，列数大于该值的行才可能是表头
+        scan_bytes / scan_lines: 表头探测只扫描的文件前缀
+        fallback: 前缀内未找到表头时是否把扫描范围扩大到 CsvReader.FALLBACK_SCAN_SCALE 倍（仍有上限）
+        engine: 解析引擎（CsvReader.ENGINES），'fast' 为 C 解析器 + 显式 float64，
+                'pyarrow' 多线程解析（未安装时退回 fast），'round_trip' 与旧版逐位一致但最慢，用于审核
+        compact: 紧凑存储，列以 float32 保存（解析仍按 float64 进行），内存减半
+    """
+    header_threshold: int = 8
+    scan_bytes: int = CsvReader.DEFAULT_SCAN_BYTES
+    scan_lines: int = CsvReader.DEFAULT_SCAN_LINES
+    fallback: bool = True
+    engine: str = CsvReader.DEFAULT_ENGINE
+    compact: bool = False
+
+    @property
+    def dtype(self):
+        return np.float32 if self.compact else np.float64
+
+
+def probe_signature(options: LoadOptions) -> list:
+    """影响表头探测结果的参数；文件夹索引、磁盘缓存和结果缓存都用它作为键的一部分，变化后要重新探测"""
+    return [options.header_threshold, options.scan_bytes, options.scan_lines, options.fallback]
+
+
+def column_key(position, options: LoadOptions):
+    """列在磁盘缓存中的键：float64 用列位置，float32 加后缀，两种版本可以同时存在"""
+    return f"{position}_f32" if options.compact else position
+
+
+def load_schema(csv_path, options: LoadOptions, cache=None):
+    """
+    读取文件结构：传入 CsvCache 时优先使用缓存，未命中再探测表头并写入缓存。
+    返回 (CsvSchema, 缓存条目目录)，不使用缓存时条目目录为 None；找不到表头返回 None。
+    """
+    entry = source = schema = None
+    if cache is not None:
+        entry, source = cache.entry(csv_path, probe_signature(options), CsvReader.resolve_engine(options.engine))
+        schema = cache.load_schema(entry, source)
+    if schema is None:
+        schema = CsvReader.probe_schema(csv_path,
+                                        options.header_threshold,
+                                        scan_bytes=options.scan_bytes,
+                                        scan_lines=options.scan_lines,
+                                        fallback=options.fallback)
+        if schema is None:
+            return None
+        if cache is not None:
+            cache.save_schema(entry, source, schema)
+    return schema, entry
+
+
+def open_store(csv_path, options: LoadOptions, cache=None, on_parse=None):
+    """
+    只探测表头和数值列，不解析数据；返回 (惰性 ColumnStore, CsvSchema)，找不到表头返回 None。
+    某一列第一次被访问时才解析该列；传入 CsvCache 时表头结构和解析过的列都会写入磁盘缓存。
+    on_parse(列名, 耗时秒数, 实际使用的解析引擎, 表头之后的数据字节数) 在每次真正解析一列后调用，
+    解析单列时整个文件都要分词，用数据字节数除以耗时即为解析吞吐量。
+    """
+    loaded = load_schema(csv_path, options, cache)
+    if loaded is None:
+        return None
+    schema, entry = loaded
+    positions = dict(zip(schema.numeric_columns, schema.numeric))
+    engine = CsvReader.resolve_engine(options.engine)
+
+    def load_column(name):
+        position = positions[name]
+        key = column_key(position, options)
+        if cache is not None:
+            values = cache.load_column(entry, key)
+            if values is not None:
+                return values
+            if options.compact:
+                # 已经缓存了 float64 版本时直接转换，不再解析 CSV
+                full = cache.load_column(entry, position)
+                if full is not None:
+                    return cache.save_column(entry, key, full.astype(np.float32))
+        t0 = time.perf_counter()
+        values = CsvReader.read_column(csv_path, schema, position, engine).astype(options.dtype, copy=False)
+        seconds = time.perf_counter() - t0
+        if cache is not None:
+            values = cache.save_column(entry, key, values)
+        if on_parse is not None:
+            on_parse(name, seconds, engine, CsvReader.stat_source(csv_path)[0] - schema.header_offset)
+        return values
+
+    def load_timestamps():
+        if cache is not None:
+            values = cache.load_column(entry, TIMESTAMP_KEY)
+            if values is not None:
+                return values
+        values = CsvReader.read_timestamps(csv_path, schema)
+        if values is not None and cache is not None:
+            values = cache.save_column(entry, TIMESTAMP_KEY, values)
+        return values
+
+    return ColumnStore(schema.numeric_columns, {}, loader=load_column, time_loader=load_timestamps), schema
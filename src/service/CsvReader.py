@@ -0,0 +1,547 @@
+# CsvReader.py
+# 与界面无关的 CSV 读取工具函数，供 FileManager 复用
+import io
+import os
+import hashlib
+import re
+import csv
+import zipfile
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow 是可选依赖，未安装时 pyarrow 引擎退回 fast
+    pa = pa_csv = None
+
+# 表头探测默认只扫描文件开头的前缀
+DEFAULT_SCAN_BYTES = 1 << 20  # 1 MB
+DEFAULT_SCAN_LINES = 2000
+# 前缀内未找到表头时，fallback 把扫描范围扩大到前缀的这么多倍（仍然有上限，格式不对的大文件不会被读到末尾）
+FALLBACK_SCAN_SCALE = 16
+# 用表头后的前若干行判断哪些列是数值列
+DEFAULT_PROBE_ROWS = 50
+# 分块解析时每块的行数
+DEFAULT_CHUNK_ROWS = 200_000
+
+# 解析引擎：
+#   fast       pandas C 解析器，数值列显式指定 float64，浮点精度 'high'
+#   pyarrow    pyarrow 多线程解析（需要安装 pyarrow），遇到不规则的行时退回 fast
+#   round_trip pandas C 解析器，浮点精度 'round_trip'，与旧版逐位一致，最慢，用于审核
+ENGINES = ('fast', 'pyarrow', 'round_trip')
+DEFAULT_ENGINE = 'fast'
+_FLOAT_PRECISION = {'fast': 'high', 'pyarrow': 'high', 'round_trip': 'round_trip'}
+
+# pandas 默认识别为缺失值的字符串
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null',
+})
+
+# 压缩包内文件的路径写作 "压缩包路径::成员路径"
+ZIP_SEPARATOR = "::"
+
+# 时间戳由这三列组成，例如 2025-1-2,11:5:43,856ms（MilliSecond 列可以没有）
+TIME_COLUMNS = ('Date', 'Time', 'MilliSecond')
+
+# 表头中需要替换的特殊符号
+COLUMN_REPLACE_MAP = {
+    'λ': '_lambda_',
+    'Σ': '_sigma_',
+    # 需要别的替换可自行补充
+}
+
+
+@dataclass
+class InstrumentMetadata:
+    """表头之前的仪器信息块，例如 Model、Update Rate、Wiring、各通道量程
+
+    Attributes:
+        sections: {段名: {键: [值, ...]}}，段名取自 "<Settings>" 这样的标记行，
+                  标记行之前的内容放在空段名 "" 下
+    """
+    sections: dict = field(default_factory=dict)
+
+    def get(self, key, default=None):
+        """按键查找（不区分所在的段），返回第一个匹配的值列表"""
+        for items in self.sections.values():
+            if key in items:
+                return items[key]
+        return default
+
+    def flat(self) -> dict:
+        """{键: 文本值}，同名键取第一次出现，多个值用 / 连接，用于分组和显示"""
+        result = {}
+        for items in self.sections.values():
+            for key, values in items.items():
+                result.setdefault(key, " / ".join(values))
+        return result
+
+    @property
+    def model(self):
+        values = self.get("Model")
+        return values[0] if values else None
+
+    @property
+    def update_rate(self):
+        """采样间隔（秒），没有 Update Rate 或无法解析时为 None"""
+        values = self.get("Update Rate")
+        return parse_duration(values[0]) if values else None
+
+
+@dataclass
+class CsvSchema:
+    """表头探测得到的文件结构
+
+    Attributes:
+        header_index: 表头所在行号（从 0 开始）
+        header_offset: 表头所在的字节偏移
+        columns: 清洗后的全部列名（重名列按 pandas 规则追加 .1、.2）
+        numeric: 数值列在文件中的位置下标
+        metadata: 表头之前的仪器信息
+    """
+    header_index: int
+    header_offset: int
+    columns: list
+    numeric: list
+    metadata: InstrumentMetadata = field(default_factory=InstrumentMetadata)
+
+    @property
+    def numeric_columns(self) -> list:
+        return [self.columns[i] for i in self.numeric]
+
+    def to_dict(self) -> dict:
+        """转成可以写入 json 的字典（磁盘缓存和文件夹索引共用）"""
+        return {
+            "header_index": self.header_index,
+            "header_offset": self.header_offset,
+            "all_columns": self.columns,
+            "numeric": self.numeric,
+            "metadata": self.metadata.sections,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """由 to_dict 的结果还原，缺少字段时抛出 KeyError"""
+        return cls(data["header_index"], data["header_offset"], data["all_columns"], data["numeric"],
+                   InstrumentMetadata(data["metadata"]))
+
+
+def resolve_engine(engine) -> str:
+    """实际使用的解析引擎：pyarrow 未安装时为 fast"""
+    if engine not in ENGINES:
+        raise ValueError(f"未知的解析引擎 {engine}")
+    if engine == 'pyarrow' and pa_csv is None:
+        return 'fast'
+    return engine
+
+
+def split_source(csv_path):
+    """拆分数据源路径，返回 (文件或压缩包路径, 压缩包内成员路径)，普通文件的成员路径为 None"""
+    if ZIP_SEPARATOR in csv_path:
+        archive, member = csv_path.split(ZIP_SEPARATOR, 1)
+        return archive, member
+    return csv_path, None
+
+
+def zip_member_path(zip_path, member) -> str:
+    return f"{zip_path}{ZIP_SEPARATOR}{member}"
+
+
+def list_zip_csv(zip_path) -> list:
+    """列出压缩包中所有 csv 成员（按压缩包内的顺序）"""
+    with zipfile.ZipFile(zip_path) as z:
+        return [info.filename for info in z.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.csv')]
+
+
+def open_source(csv_path):
+    """以二进制方式打开数据源；压缩包成员直接从压缩包中流式解压，不落地到磁盘"""
+    archive, member = split_source(csv_path)
+    if member is None:
+        return open(archive, 'rb')
+    return zipfile.ZipFile(archive).open(member)
+
+
+def stat_source(csv_path):
+    """返回数据源的 (大小, 修改时间 ns)，压缩包成员使用解压后的大小和压缩包的修改时间"""
+    archive, member = split_source(csv_path)
+    stat = os.stat(archive)
+    if member is None:
+        return stat.st_size, stat.st_mtime_ns
+    with zipfile.ZipFile(archive) as z:
+        return z.getinfo(member).file_size, stat.st_mtime_ns
+
+
+def content_hash(csv_path, block_size=8 << 20) -> str:
+    """文件（或压缩包成员）内容的 blake2b 哈希，按块读取，内存占用与文件大小无关"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open_source(csv_path) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _col_count(raw_line: bytes) -> int:
+    """统计一行的列数，空行记为 0（逗号在 utf-8 中是单字节，可直接按字节统计）"""
+    stripped = raw_line.strip()
+    if not stripped:
+        return 0
+    return stripped.count(b',') + 1
+
+
+def detect_header(csv_path, threshold, scan_bytes=DEFAULT_SCAN_BYTES, scan_lines=DEFAULT_SCAN_LINES, fallback=True):
+    """
+    流式扫描 CSV 文件开头，找到真正的表头行。
+    判定规则与原实现一致：第一行列数 > threshold 且下一行列数与之相同，即视为表头。
+    只在前 scan_bytes 字节 / scan_lines 行内查找；超出前缀仍未找到时，
+    fallback=True 会接着逐行扫描，直到 FALLBACK_SCAN_SCALE 倍的前缀为止（第二段有界扫描，不会读到文件末尾），
+    否则直接放弃。
+    返回：
+      - 找到时返回 (表头行号, 表头行起始字节偏移)
+      - 找不到返回 None
+    """
+    if fallback:
+        scan_bytes *= FALLBACK_SCAN_SCALE
+        scan_lines *= FALLBACK_SCAN_SCALE
+    with open_source(csv_path) as f:
+        offset = 0
+        prev_count = 0
+        prev_offset = 0
+        for index in range(scan_lines):
+            # 单行也不超过剩余的字节数，没有换行符的大文件同样有界
+            raw_line = f.readline(scan_bytes - offset)
+            if not raw_line or (offset + len(raw_line) >= scan_bytes and not raw_line.endswith(b'\n')):
+                # 文件结束，或者这一行被截断（超出范围）
+                return None
+            count = _col_count(raw_line)
+            if prev_count > threshold and count == prev_count:
+                return index - 1, prev_offset
+            prev_count = count
+            prev_offset = offset
+            offset += len(raw_line)
+    return None
+
+
+def open_at_header(csv_path, byte_offset):
+    """以二进制方式打开文件并定位到表头所在位置，交给 pandas 直接从表头开始解析"""
+    f = open_source(csv_path)
+    f.seek(byte_offset)
+    return f
+
+
+def clean_columns(columns) -> list:
+    """清洗表头中不需要的符号，比如 λ、Σ 等"""
+    new_columns = []
+    for col in columns:
+        for old, new in COLUMN_REPLACE_MAP.items():
+            col = col.replace(old, new)
+        new_columns.append(col)
+    return new_columns
+
+
+def _is_number(text: str) -> bool:
+    """判断单元格是否可以被当作数值（空值、pandas 默认的缺失值记号也算）"""
+    text = text.strip()
+    if not text or text in NA_VALUES:
+        return True
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def probe_numeric_columns(f, probe_rows=DEFAULT_PROBE_ROWS):
+    """
+    从当前位置（表头行）读取表头和前 probe_rows 个非空数据行，推断数值列。
+    只读取这几行文本，不经过 pandas，开销可以忽略。
+    返回 (全部列名, 数值列的位置下标)
+    """
+    lines = []
+    while len(lines) <= probe_rows:
+        raw_line = f.readline()
+        if not raw_line:
+            break
+        if raw_line.strip():
+            lines.append(raw_line.decode('utf-8-sig' if not lines else 'utf-8'))
+    rows = list(csv.reader(lines))
+    if not rows:
+        return [], []
+    columns, data = rows[0], rows[1:]
+    numeric = [i for i in range(len(columns))
+               if all(_is_number(row[i]) for row in data if i < len(row))]
+    return columns, numeric
+
+
+_DURATION_UNITS = {'us': 1e-6, 'ms': 1e-3, 's': 1.0, 'min': 60.0}
+
+
+def parse_duration(text):
+    """把 "100ms"、"1s" 这样的时长解析成秒，无法解析返回 None"""
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*(us|ms|s|min)?\s*', text, re.IGNORECASE)
+    if not match:
+        return None
+    return float(match.group(1)) * _DURATION_UNITS[(match.group(2) or 's').lower()]
+
+
+def read_metadata(csv_path, header_offset) -> InstrumentMetadata:
+    """
+    解析表头之前的仪器信息块（只读取表头之前的字节）。
+    形如 "<Settings>" 的单独一行开始一个新段，其余非空行第一格为键，后面的非空格为值。
+    """
+    with open_source(csv_path) as f:
+        text = f.read(header_offset).decode('utf-8-sig', errors='replace')
+    sections = {}
+    section = ""
+    for row in csv.reader(text.splitlines()):
+        cells = [cell.strip() for cell in row]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells or not cells[0]:
+            continue
+        if len(cells) == 1 and cells[0].startswith('<') and cells[0].endswith('>'):
+            section = cells[0][1:-1]
+            continue
+        sections.setdefault(section, {}).setdefault(cells[0], cells[1:])
+    return InstrumentMetadata(sections)
+
+
+def _mangle_duplicates(columns) -> list:
+    """与 pandas 一致，重名列依次改名为 name.1、name.2 ..."""
+    seen = set()
+    result = []
+    for col in columns:
+        name, k = col, 0
+        while name in seen:
+            k += 1
+            name = f"{col}.{k}"
+        seen.add(name)
+        result.append(name)
+    return result
+
+
+def probe_schema(csv_path, threshold, scan_bytes=DEFAULT_SCAN_BYTES, scan_lines=DEFAULT_SCAN_LINES,
+                 fallback=True, probe_rows=DEFAULT_PROBE_ROWS):
+    """只读取到表头和前几行数据，得到 CsvSchema（包括表头之前的仪器信息），找不到表头返回 None"""
+    header = detect_header(csv_path, threshold, scan_bytes, scan_lines, fallback)
+    if header is None:
+        return None
+    header_index, header_offset = header
+    with open_at_header(csv_path, header_offset) as f:
+        columns, numeric = probe_numeric_columns(f, probe_rows)
+    columns = clean_columns(_mangle_duplicates(columns))
+    return CsvSchema(header_index, header_offset, columns, numeric, read_metadata(csv_path, header_offset))
+
+
+def _arrow_options(schema: CsvSchema, positions, block_size=None):
+    """pyarrow 的读取参数：跳过表头行，列按位置命名，只转换所选列为 float64，缺失值记号与 pandas 一致"""
+    names = [f"c{i}" for i in range(len(schema.columns))]
+    read_options = pa_csv.ReadOptions(column_names=names, skip_rows=1, use_threads=True,
+                                      **({} if block_size is None else {'block_size': block_size}))
+    convert_options = pa_csv.ConvertOptions(include_columns=[names[i] for i in positions],
+                                            column_types={names[i]: pa.float64() for i in positions},
+                                            null_values=list(NA_VALUES))
+    return read_options, pa_csv.ParseOptions(ignore_empty_lines=True), convert_options
+
+
+def _arrow_column(column) -> np.ndarray:
+    """pyarrow 的 float64 列转成 numpy 数组，空值为 NaN"""
+    return np.ascontiguousarray(column.to_numpy(zero_copy_only=False), dtype=np.float64)
+
+
+def _arrow_chunks(csv_path, schema: CsvSchema, positions, chunk_rows):
+    """pyarrow 流式读取，每次产出约 chunk_rows 行（按块大小估算）"""
+    block_size = max(1 << 20, min(64 << 20, chunk_rows * 32))
+    with open_at_header(csv_path, schema.header_offset) as f:
+        reader = pa_csv.open_csv(f, *_arrow_options(schema, positions, block_size))
+        for batch in reader:
+            if batch.num_rows:
+                yield np.column_stack([_arrow_column(column) for column in batch.columns])
+
+
+def iter_numeric_chunks(csv_path, schema: CsvSchema, engine=DEFAULT_ENGINE, chunk_rows=DEFAULT_CHUNK_ROWS,
+                        positions=None):
+    """
+    从表头位置开始分块解析数值列，每次产出一个 (行数, 列数) 的 float64 数组，
+    内存占用与文件大小无关。positions 为要解析的列位置，默认是全部数值列，产出的列按 positions 的顺序排列。
+    行号规则与 read_column 一致（只跳过空行）。遇到非数值内容时抛出 ValueError。
+    """
+    positions = schema.numeric if positions is None else list(positions)
+    if not positions:
+        raise ValueError("未推断出数值列")
+    # usecols 得到的列按文件中的顺序排列，这里换回 positions 的顺序
+    order = np.argsort(np.argsort(positions))
+    if resolve_engine(engine) == 'pyarrow':
+        for block in _arrow_chunks(csv_path, schema, sorted(positions), chunk_rows):
+            yield block[:, order]
+        return
+    with open_at_header(csv_path, schema.header_offset) as f:
+        reader = pd.read_csv(
+            f,
+            header=0,
+            usecols=positions,
+            dtype=np.float64,
+            encoding='utf-8',
+            float_precision=_FLOAT_PRECISION[engine],
+            skip_blank_lines=True,
+            chunksize=chunk_rows
+        )
+        with reader:
+            for chunk in reader:
+                yield chunk.values[:, order]
+
+
+def _read_column_arrow(csv_path, schema: CsvSchema, position) -> np.ndarray:
+    with open_at_header(csv_path, schema.header_offset) as f:
+        table = pa_csv.read_csv(f, *_arrow_options(schema, [position]))
+    return _arrow_column(table.column(0).combine_chunks())
+
+
+def read_column(csv_path, schema: CsvSchema, position, engine=DEFAULT_ENGINE) -> np.ndarray:
+    """
+    从表头位置开始只解析第 position 列（文件中的位置下标），返回一维 float64 数组。
+    其他列只做分词不做数值转换；空行被跳过，各列行号保持一致。
+    探测行之后出现非数值内容时，该列中无法转换的单元格记为 NaN。
+    pyarrow 引擎遇到无法按 float64 解析或列数不一致的行时退回 fast。
+    """
+    if resolve_engine(engine) == 'pyarrow':
+        try:
+            return _read_column_arrow(csv_path, schema, position)
+        except ValueError:  # pyarrow.ArrowInvalid
+            engine = 'fast'
+    with open_at_header(csv_path, schema.header_offset) as f:
+        try:
+            values = pd.read_csv(
+                f,
+                header=0,
+                usecols=[position],
+                dtype=np.float64,
+                encoding='utf-8',
+                float_precision=_FLOAT_PRECISION[engine],
+                skip_blank_lines=True
+            ).iloc[:, 0].values
+        except ValueError:
+            f.seek(schema.header_offset)
+            column = pd.read_csv(f, header=0, usecols=[position], dtype=str, encoding='utf-8',
+                                 skip_blank_lines=True).iloc[:, 0]
+            values = pd.to_numeric(column, errors='coerce').values.astype(np.float64)
+    return np.ascontiguousarray(values)
+
+
+def _parse_unique(column, parse):
+    """
+    先用 pd.factorize 把整列映射成 (编码, 不重复取值)，只对不重复的取值做解析再按编码展开。
+    日期、时分秒、毫秒的取值种类远少于行数，逐行的工作只有 C 实现的哈希和一次整数下标。
+    """
+    codes, uniques = pd.factorize(column, sort=False)
+    if (codes < 0).any():
+        raise ValueError("时间列存在空值")
+    parsed = np.array([parse(text.strip()) for text in uniques], dtype=np.int64)
+    return parsed[codes]
+
+
+def _date_ns(text) -> int:
+    return pd.Timestamp(text.replace('/', '-')).value
+
+
+def _time_ns(text) -> int:
+    hours, minutes, seconds = text.split(':')
+    return (int(hours) * 3600 + int(minutes) * 60) * 1_000_000_000 + round(float(seconds) * 1e9)
+
+
+def _millisecond_ns(text) -> int:
+    return int(text.lower().removesuffix('ms').strip()) * 1_000_000
+
+
+def _time_positions(schema: CsvSchema) -> dict:
+    """时间列 {列名: 位置下标}，文件没有 Date 和 Time 列时返回空字典"""
+    if TIME_COLUMNS[0] not in schema.columns or TIME_COLUMNS[1] not in schema.columns:
+        return {}
+    return {name: schema.columns.index(name) for name in TIME_COLUMNS if name in schema.columns}
+
+
+def _combine_timestamps(columns: dict):
+    """把 {时间列名: 文本列} 合成 int64 纳秒时间戳，无法解析返回 None"""
+    parsers = {'Date': _date_ns, 'Time': _time_ns, 'MilliSecond': _millisecond_ns}
+    try:
+        timestamps = np.zeros(len(next(iter(columns.values()))), dtype=np.int64)
+        for name, column in columns.items():
+            timestamps += _parse_unique(column, parsers[name])
+    except (ValueError, OverflowError):
+        return None
+    return timestamps
+
+
+def read_timestamps(csv_path, schema: CsvSchema):
+    """
+    把 Date / Time / MilliSecond 三列解析成一个 int64 的纳秒时间戳数组（按本地时间，不做时区换算），
+    行号规则与 read_column 一致。文件没有这些列或无法解析时返回 None。
+    """
+    time_positions = _time_positions(schema)
+    if not time_positions:
+        return None
+    positions = list(time_positions.values())
+    with open_at_header(csv_path, schema.header_offset) as f:
+        frame = pd.read_csv(f, header=0, usecols=positions, dtype=str, encoding='utf-8',
+                            keep_default_na=False, skip_blank_lines=True)
+    # usecols 得到的列按文件中的顺序排列
+    by_position = dict(zip(sorted(positions), range(len(positions))))
+    return _combine_timestamps({name: frame.iloc[:, by_position[position]]
+                                for name, position in time_positions.items()})
+
+
+def locate_row_end(csv_path, header_offset, rows):
+    """
+    从表头开始数过 rows 个非空数据行，返回 (实际数到的行数, 这些行之后的字节偏移)。
+    没有换行符结尾的最后一行视为仪器还没写完，不计入，偏移停在该行开头。
+    """
+    with open_at_header(csv_path, header_offset) as f:
+        offset = header_offset + len(f.readline())
+        count = 0
+        while count < rows:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if line.strip():
+                count += 1
+    return count, offset
+
+
+def read_appended(csv_path, schema: CsvSchema, offset, positions, engine=DEFAULT_ENGINE,
+                  timestamps=False, max_bytes=DEFAULT_SCAN_BYTES * 64):
+    """
+    只解析 offset 之后新追加的完整行（最多 max_bytes 字节，不完整的最后一行留到下次）。
+    返回 ({列位置: float64 数组}, 时间戳或 None, 新的偏移)，没有新的完整行时数组为空。
+    行号规则与 read_column 一致：空行被跳过，无法转换的单元格记为 NaN。
+    新追加的数据量很小，pyarrow 引擎也直接用 pandas 解析。
+    """
+    float_precision = _FLOAT_PRECISION[engine]
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+    end = data.rfind(b'\n') + 1
+    data = data[:end]
+    if not data.strip():
+        return {position: np.empty(0) for position in positions}, None, offset + end
+    names = range(len(schema.columns))
+    try:
+        frame = pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=positions, dtype=np.float64,
+                            encoding='utf-8', float_precision=float_precision, skip_blank_lines=True)
+    except ValueError:
+        frame = pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=positions, dtype=str,
+                            encoding='utf-8', skip_blank_lines=True).apply(pd.to_numeric, errors='coerce')
+    values = {position: np.ascontiguousarray(frame[position].values, dtype=np.float64) for position in positions}
+    new_timestamps = None
+    time_positions = _time_positions(schema)
+    if timestamps and time_positions:
+        times = pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=list(time_positions.values()),
+                            dtype=str, encoding='utf-8', keep_default_na=False, skip_blank_lines=True)
+        new_timestamps = _combine_timestamps({name: times[position] for name, position in time_positions.items()})
+    return values, new_timestamps, offset + end
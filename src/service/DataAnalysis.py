@@ -1,16 +1,27 @@
 # 用于数据分析的类 DataAnalysis.py
-import pandas as pd
 import numpy as np
-from numpy.lib.stride_tricks import sliding_window_view
+from service import Stats
+
+# 缓存的滑动标准差和阈值曲线最多占用的内存（字节）。小文件可以留下几个窗口的结果，调回之前的窗口时不用重新计算；
+# 大文件（1e7 点时一组就有 80 MB）只保留当前窗口，即窗口一变旧的结果就失效
+ROLLING_STD_CACHE_BYTES = 64 << 20
 
 class DataAnalysis:
     def __init__(self, main_window):
         self.main_window = main_window
         self.main_ui = main_window.main_ui
-        self.df = None
+        self.store = None
+        self._elapsed_time = None
         self._data_avg = {}
         self._data_max_min = {}
         self._stable_interval = {}
+        # 每列的区间最大/最小值查询索引（Stats.RangeMaxMin），第一次统计该列的稳定区间时建立
+        self._range_index = {}
+        # 每列的滑动标准差，按 (列名, 窗口) 缓存，调整阈值时只需重新比较；
+        # 按最近使用的顺序排列，总大小超过 ROLLING_STD_CACHE_BYTES 时淘汰最久没用的（当前窗口总是保留）
+        self._rolling_std = {}
+        # 突变点个数随阈值变化的阶梯函数（Stats.jump_count_curve），与滑动标准差一起缓存和失效
+        self._jump_curve = {}
     
     @property
     def data_avg(self):
@@ -28,105 +39,172 @@ class DataAnalysis:
         self._stable_interval[name] = stable_interval
         return self._stable_interval[name]
 
-    def set_table_data(self, df):
-        self.df = df
+    def set_table_data(self, store):
+        self.store = store
+        self._elapsed_time = None
+        self._range_index = {}
+        self._rolling_std = {}
+        self._jump_curve = {}
+
+    def data_appended(self):
+        # 文件追加了新行，之前按旧行数计算的时间轴、区间查询索引和滑动标准差失效
+        self._elapsed_time = None
+        self._range_index = {}
+        self._rolling_std = {}
+        self._jump_curve = {}
 
     def get_table_header(self)->list:
         # 获取表头
-        table_header = self.df.columns.tolist()
+        table_header = list(self.store.columns)
         return table_header
     
     def get_table_num(self)->int:
         # 获取表格行数
-        return len(self.df)
+        return len(self.store)
     
     def get_table_columns(self)->int:
         # 获取表格列数
-        return len(self.df.columns)
+        return len(self.store.columns)
     
     def get_var_value(self, var_name):
-        # 获取变量值
-        return self.df[var_name].values
+        # 获取变量值（可能是 memmap 视图，未访问的部分不会读入内存）
+        return self.store[var_name]
     
-    def cal_avg(self,master_var, var_name):
-        # 计算平均值
+    def get_timestamps(self):
+        # 获取每行的时间戳（int64 纳秒，由 Date/Time/MilliSecond 列解析），没有时间列时返回 None
+        if self.store is None:
+            return None
+        return self.store.timestamps
+
+    def get_elapsed_time(self):
+        """
+        每行相对第一行的时间（秒，float64），只解析一次。
+        没有时间列，或时间戳不是严格递增（例如只有精确到秒的 Time 列）时返回 None，
+        此时仍然用 数据点位 * ΔT 作为时间轴。
+        """
+        if self._elapsed_time is None:
+            timestamps = self.get_timestamps()
+            if timestamps is None or len(timestamps) < 2 or not (np.diff(timestamps) > 0).all():
+                return None
+            self._elapsed_time = (timestamps - timestamps[0]) / 1e9
+        return self._elapsed_time
+
+    def cal_avg(self, master_var, var_list):
+        # 计算所有变量的平均值
         if not self.stable_interval[master_var]:
-            self.data_avg[var_name] = [self.df[var_name].mean()]
+            for var_name in var_list:
+                self.data_avg[var_name] = [Stats.mean(self.get_var_value(var_name))]
             return
-        
-        self.data_avg[var_name] = []
-        for interval in self.stable_interval[master_var]:
-            avg = self.df[var_name][interval[0]:interval[1]].mean()
-            self.data_avg[var_name].append(avg)
+
+        # 每列在自己的视图上一次求出所有稳定区间的均值；不把各列拼成二维块，
+        # 那样每次都要拷贝整列，内存映射的列也会被整列读入
+        for var_name in var_list:
+            self.data_avg[var_name] = Stats.interval_means(self.get_var_value(var_name),
+                                                           self.stable_interval[master_var]).tolist()
     
+    def get_range_index(self, var_name):
+        # 获取列的区间最大/最小值查询索引，只建立一次
+        range_index = self._range_index.get(var_name)
+        if range_index is None:
+            range_index = self._range_index[var_name] = Stats.RangeMaxMin(self.get_var_value(var_name))
+        return range_index
+
     def cal_max_min(self, master_var,var_name):
         # 计算最大最小值以及对应的索引
+        values = self.get_var_value(var_name)
         if not self.stable_interval[master_var]:
-            self.data_max_min[var_name] = [[self.df[var_name].max(), self.df[var_name].idxmax() ,self.df[var_name].min(),self.df[var_name].idxmin() ]]
+            self.data_max_min[var_name] = [Stats.max_min(values)]
             return
-        self.data_max_min[var_name] = []
-        for interval in self.stable_interval[master_var]:
-            max_value = self.df[var_name][interval[0]:interval[1]].max()
-            max_value_index = self.df[var_name][interval[0]:interval[1]].idxmax()
-            min_value = self.df[var_name][interval[0]:interval[1]].min()
-            min_value_index = self.df[var_name][interval[0]:interval[1]].idxmin()
-            self.data_max_min[var_name].append((max_value,
-                                                max_value_index,
-                                                min_value,
-                                                min_value_index))
+        range_index = self.get_range_index(var_name)
+        self.data_max_min[var_name] = [range_index.query(interval[0], interval[1])
+                                       for interval in self.stable_interval[master_var]]
         
         
     def detect_jumps(self, key , window, threshold):
         """优化后的突变点检测算法"""
-        # 使用numpy的滑动窗口函数
-        values = self.df[key].values
-        windows = sliding_window_view(values, window)
-        
-        # 计算每个窗口的标准差
-        stds = np.std(windows, axis=1)
+        values = self.get_var_value(key)
+        # 计算每个窗口的标准差（总体标准差，第 i 个值对应从 i 开始的窗口）
+        stds = Stats.rolling_std(values, window, ddof=0)[window - 1:]
 
         # 检测突变点（标准差超过阈值）
-        jumps = np.where(stds > threshold)[0]
+        jumps = np.flatnonzero(stds > threshold)
 
-        if len(jumps) == 0:
-            return []
-        
         # 去除连续点，只保留突变起始点
-        clean_jumps = [jumps[0]]
-        for i in range(1, len(jumps)):
-            if jumps[i] - jumps[i - 1] > window:
-                clean_jumps.append(jumps[i])
-        
-        return clean_jumps
+        return Stats.run_starts(jumps, window).tolist()
     
     
-    def pandas_detect_jumps(self, key , window, threshold):
-        """检测突变点位置"""
-        # 计算滑动窗口内的标准差
-        rolling_std = self.df[key].rolling(window).std()
+    def get_rolling_std(self, key, window):
+        # 获取列的滑动标准差（样本标准差，对齐到窗口末尾），同一列、同一窗口只计算一次
+        rolling_std = self._rolling_std.pop((key, window), None)
+        if rolling_std is None:
+            rolling_std = Stats.rolling_std(self.get_var_value(key), window)
+        # 重新插入到末尾，字典的顺序即最近使用的顺序
+        self._rolling_std[(key, window)] = rolling_std
+        self._trim_rolling_std()
+        return rolling_std
 
-        # 检测突变点（标准差超过阈值）
-        jumps = self.df.index[rolling_std > threshold].tolist()
+    def _cached_bytes(self, cache_key):
+        # 一组 (列名, 窗口) 的滑动标准差及其阈值曲线占用的内存
+        curve = self._jump_curve.get(cache_key, ())
+        return self._rolling_std[cache_key].nbytes + sum(part.nbytes for part in curve)
 
-        if len(jumps) == 0:
-            return []
-        
-        # 去除连续点，只保留突变起始点
-        clean_jumps = [jumps[0]]
-        for i in range(1, len(jumps)):
-            if jumps[i] - jumps[i - 1] > window:
-                clean_jumps.append(jumps[i])
+    def _trim_rolling_std(self):
+        # 按字节数限制缓存，从最久没用的开始淘汰，最近使用的一组总是保留
+        total = sum(self._cached_bytes(cache_key) for cache_key in self._rolling_std)
+        while total > ROLLING_STD_CACHE_BYTES and len(self._rolling_std) > 1:
+            oldest = next(iter(self._rolling_std))
+            total -= self._cached_bytes(oldest)
+            del self._rolling_std[oldest]
+            self._jump_curve.pop(oldest, None)
 
-        return clean_jumps
-    
-    def cal_csv_avg(self,df, var_name):
-        # 计算平均值
-        return df[var_name].mean()
+    def threshold_curve(self, key, window, t_min, t_max):
+        """
+        当前窗口下突变点个数随阈值变化的阶梯函数，限定在 [t_min, t_max]：
+        返回 (thresholds, counts)，从 thresholds[i] 到下一个断点之前检测到 counts[i] 个突变点。
+        一次排序得到所有阈值下的个数，不需要逐个阈值重新检测。
+        """
+        curve = self._jump_curve.get((key, window))
+        if curve is None:
+            curve = self._jump_curve[(key, window)] = Stats.jump_count_curve(self.get_rolling_std(key, window), window)
+            self._trim_rolling_std()
+        lower, upper = curve
+        breaks = np.unique(np.concatenate((lower, upper)))
+        thresholds = np.concatenate(([t_min], breaks[(breaks > t_min) & (breaks < t_max)]))
+        counts = np.searchsorted(lower, thresholds, 'right') - np.searchsorted(upper, thresholds, 'right')
+        return thresholds, counts
 
-    def cal_csv_min(self,df,var_name):
-        # 计算最小值
-        return df[var_name].min(),df[var_name].idxmin()
+    def jump_count_grid(self, key, windows, thresholds):
+        """
+        各窗口、各阈值下检测到的突变点个数，返回 (窗口数, 阈值数) 的整数数组，用于显示灵敏度图。
+        每个窗口的滑动标准差 O(n) 计算一次（已缓存的窗口直接复用，新算的不放入缓存），所有阈值在它上面比较。
+        """
+        grid = np.zeros((len(windows), len(thresholds)), dtype=np.int64)
+        for i, window in enumerate(windows):
+            rolling_std = self._rolling_std.get((key, window))
+            if rolling_std is None:
+                rolling_std = Stats.rolling_std(self.get_var_value(key), window)
+            grid[i] = Stats.jump_counts(rolling_std, window, thresholds)
+        return grid
 
-    def cal_csv_max(self,df,var_name):
-        # 计算最大值
-        return df[var_name].max(),df[var_name].idxmax()
\ No newline at end of file
+    def pandas_detect_jumps(self, key , window, threshold, start=0):
+        """
+        检测突变点位置。
+        start > 0 时只返回 start 及之后的突变点（跟踪文件追加时只检测新数据），结果与整列重新检测一致（不计浮点舍入）：
+        只需要再往前多算 2 * window 个点，就能得到 start 之前最近的原始突变点，用来去除连续点。
+        """
+        begin = max(0, start - 2 * window + 1)
+        # 计算滑动窗口内的标准差（样本标准差，对齐到窗口末尾，与 pandas rolling(window).std() 一致）；
+        # 整列检测时使用缓存，拖动阈值滑块只需重新比较
+        if begin == 0:
+            rolling_std = self.get_rolling_std(key, window)
+        else:
+            rolling_std = Stats.rolling_std(self.get_var_value(key)[begin:], window)
+
+        # 检测突变点（标准差超过阈值）
+        jumps = np.flatnonzero(rolling_std > threshold) + begin
+        if start > 0:
+            jumps = jumps[jumps >= start - window]
+
+        # 去除连续点，只保留突变起始点
+        clean_jumps = Stats.run_starts(jumps, window)
+        return clean_jumps[clean_jumps >= start].tolist()
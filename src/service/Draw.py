@@ -9,6 +9,9 @@ from matplotlib.ticker import FuncFormatter
 from service.ReportTable import ReportTable
 from service.DataAnalysis import DataAnalysis
 from service.ScatterManager import ScatterManager
+from service.SensitivityMap import SensitivityMap, sensitivity_windows, THRESHOLD_STEPS
+from service import Stats
+import numpy as np
 import copy,random
 
 class Draw:
@@ -42,15 +45,22 @@ class Draw:
         self.mpl_widget = self.main_window.findChild(MplWidget, "mplWidget")  # "mplWidget" 是你在 Qt Designer 中设置的 objectName
         # 访问 canvas 属性并绘图
         self.canvas = self.mpl_widget.canvas
+        # 滑块上方的 突变点个数-阈值 曲线
+        self.ax_curve = None
+        # 点击阈值曲线打开的灵敏度图窗口，第一次打开时创建
+        self.sensitivity_map = None
+        self._sensitivity = None
         self.reset()
         # 添加滑块
         self.slider = self.add_threshold_slider(self.main_ui.doubleSpinBox_2.value(),self.main_ui.doubleSpinBox_3.value()) 
+        self.ax_curve = self.add_threshold_curve()
         # 绑定事件
         self.slider.on_changed(lambda val: self.update_jumps())
         # 更新阈值
         self.main_ui.doubleSpinBox_2.valueChanged.connect(self.update_slider_threshold)
         self.main_ui.doubleSpinBox_3.valueChanged.connect(self.update_slider_threshold)
-        self.main_ui.spinBox_3.valueChanged.connect(lambda val: self.update_jumps())
+        self.main_ui.spinBox_3.valueChanged.connect(self.update_window)
+        self.canvas.mpl_connect('button_press_event', self.on_curve_click)
         # Matplotlib 自动计算比较合适的边距和间隔。
         self.canvas.fig.tight_layout()
 
@@ -76,6 +86,15 @@ class Draw:
         # self.canvas.ax_left.set_zorder(1)
         # 清空表格
         self.report_table.clear_all_columns()
+        # 清空阈值曲线
+        if self.ax_curve is not None:
+            self.ax_curve.cla()
+            self.ax_curve.set_visible(False)
+        self._curve_key = None
+        # 换了数据，灵敏度图失效
+        if self.sensitivity_map is not None:
+            self.sensitivity_map.hide()
+        self._sensitivity = None
         # Matplotlib 自动计算比较合适的边距和间隔。
         self.canvas.fig.tight_layout()
     
@@ -152,6 +171,75 @@ class Draw:
         self.canvas.fig.delaxes(self.slider.ax)
         self.slider = self.add_threshold_slider(initial_threshold,max_threshold)
         self.slider.on_changed(lambda val: self.update_jumps())
+        # 阈值范围变了，重画阈值曲线
+        master_var = self.main_ui.comboBox2_3.currentText()
+        if master_var and self._curve_key is not None:
+            self.update_threshold_curve(master_var)
+            self.canvas.draw_idle()
+
+    def add_threshold_curve(self):
+        """在阈值滑块右侧添加一个小坐标轴，显示突变点个数随阈值的变化（横轴与滑块的阈值范围相同）"""
+        ax_curve = self.canvas.fig.add_axes([0.86, 0.004, 0.12, 0.04])
+        ax_curve.set_visible(False)
+        return ax_curve
+
+    def update_threshold_curve(self, master_var):
+        """
+        更新阈值曲线：当前窗口下突变点个数随阈值变化的阶梯曲线（对数纵轴），标出最宽的几段平台（推荐阈值范围），
+        红线是滑块当前的阈值。只有变量、窗口、阈值范围或数据长度变化时才重新计算，拖动滑块只移动红线。
+        """
+        window = self.main_ui.spinBox_3.value()
+        t_min, t_max = self.slider.valmin, self.slider.valmax
+        key = (master_var, window, t_min, t_max, self.data_analysis.get_table_num())
+        if key == self._curve_key:
+            self._curve_marker.set_xdata([self.slider.val, self.slider.val])
+            return
+        thresholds, counts = self.data_analysis.threshold_curve(master_var, window, t_min, t_max)
+        ax = self.ax_curve
+        ax.cla()
+        ax.step(np.append(thresholds, t_max), np.append(counts, counts[-1]), where='post', color='steelblue', linewidth=0.8)
+        ax.set_yscale('symlog', linthresh=1)
+        for start, end, count in Stats.plateaus(thresholds, counts, t_max):
+            ax.axvspan(start, end, color='green', alpha=0.2, linewidth=0)
+            ax.text((start + end) / 2, 0.5, f"{count}", transform=ax.get_xaxis_transform(),
+                    ha='center', va='center', fontsize=7, color='darkgreen')
+        self._curve_marker = ax.axvline(self.slider.val, color='red', linewidth=0.8)
+        ax.set_xlim(t_min, t_max)
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.text(0.01, 0.95, "突变数", transform=ax.transAxes, ha='left', va='top', fontsize=6, color='gray')
+        ax.set_visible(True)
+        self._curve_key = key
+
+    def on_curve_click(self, event):
+        """点击阈值曲线打开灵敏度图"""
+        if event.inaxes is self.ax_curve and self.ax_curve.get_visible():
+            self.show_sensitivity_map()
+
+    def show_sensitivity_map(self):
+        """
+        灵敏度图：当前窗口附近的一组窗口 x 滑块阈值范围内的一组阈值，每格为检测到的突变点个数，
+        由 DataAnalysis.jump_count_grid 一次算出。点击某一格即把窗口和阈值设为该格的值。
+        """
+        master_var = self.main_ui.comboBox2_3.currentText()
+        if not master_var:
+            return
+        window = self.main_ui.spinBox_3.value()
+        windows = sensitivity_windows(window)
+        thresholds = np.linspace(self.slider.valmin, self.slider.valmax, THRESHOLD_STEPS)
+        grid = self.data_analysis.jump_count_grid(master_var, windows, thresholds)
+        self._sensitivity = (f"{master_var}（共 {self.data_analysis.get_table_num()} 个点）", windows, thresholds, grid)
+        if self.sensitivity_map is None:
+            self.sensitivity_map = SensitivityMap(self.main_window, self.select_sensitivity)
+        self.sensitivity_map.update_map(*self._sensitivity, window, self.slider.val)
+        self.sensitivity_map.show()
+        self.sensitivity_map.raise_()
+
+    def select_sensitivity(self, window, threshold):
+        """在灵敏度图中选中的窗口和阈值：更新窗口和滑块（重新检测突变点），并移动图中的红点"""
+        self.main_ui.spinBox_3.setValue(window)
+        self.slider.set_val(threshold)
+        self.sensitivity_map.update_map(*self._sensitivity, window, threshold)
         
     def draw_reference_line(self, name, jumps):
         """绘制参考线"""
@@ -183,12 +271,51 @@ class Draw:
         
         # 删除所有现有参考线
         reference_line_manager.clear_lines()
-        # 重新检测突变点
+        # 重新检测突变点（滑动标准差已缓存，只需重新比较阈值）
         jumps = self.data_analysis.pandas_detect_jumps(
                                                 master_var,
                                                 self.main_ui.spinBox_3.value(), 
                                                 self.slider.val)
         self.draw_reference_line(master_var,jumps)
+        self.update_threshold_curve(master_var)
+        self.canvas.draw_idle()
+
+    def update_window(self, window):
+        """
+        突变检测窗口改变：重新检测。缓存按字节数限制（DataAnalysis.ROLLING_STD_CACHE_BYTES），
+        小文件最近用过的几个窗口的滑动标准差仍在缓存中，调回去时不用重新计算；大文件只保留当前窗口。
+        """
+        self.update_jumps()
+
+    def append_rows(self, start):
+        """
+        文件末尾追加了新行（从第 start 行开始）：更新折线和散点的数据，
+        只对新数据检测突变点并追加参考线，稳定区间和表格随之更新；不清空用户已有的参考线和斜率线。
+        """
+        self.data_analysis.data_appended()
+        for label, line_manager in self.line_manager.items():
+            line_manager.y_value = self.data_analysis.get_var_value(label)
+        elapsed = self.data_analysis.get_elapsed_time() if self.main_ui.checkBox_3.isChecked() else None
+        for label, scatter in self.scatter_manager.items():
+            scatter.set_data(self.data_analysis.get_var_value(label))
+            if scatter.time_axis is not None:
+                scatter.time_axis = elapsed
+        master_var = self.main_ui.comboBox2_3.currentText()
+        reference_line_manager = self.reference_line_manager.get(master_var)
+        if reference_line_manager is not None:
+            jumps = self.data_analysis.pandas_detect_jumps(master_var,
+                                                           self.main_ui.spinBox_3.value(),
+                                                           self.slider.val,
+                                                           start)
+            # 会依次更新稳定区间、折线和表格
+            reference_line_manager.append_data(self.data_analysis.get_var_value(master_var), jumps)
+        else:
+            for line_manager in self.line_manager.values():
+                line_manager.stable_interval = line_manager.stable_interval
+        # 手动设置过的 y 轴范围不会被自动缩放覆盖
+        for ax in (self.canvas.ax_left, self.canvas.ax_right):
+            ax.relim()
+            ax.autoscale_view()
         self.canvas.draw_idle()
 
     def update_lines(self,stable_interval):
@@ -209,10 +336,8 @@ class Draw:
         self.data_analysis.set_stable_interval(self.main_ui.comboBox2_3.currentText(), stable_interval)
         cal_list = copy.deepcopy(self.main_window.slave_var)
         cal_list.insert(0,self.main_ui.comboBox2_3.currentText())
-        # 计算所有主/从变量平均值
-        for var in cal_list:
-            self.data_analysis.cal_avg(cal_list[0],var)
-        # 计算所有主/从变量最大最小值
+        # 计算所有主/从变量平均值和最大最小值
+        self.data_analysis.cal_avg(cal_list[0], cal_list)
         for var in cal_list:
             self.data_analysis.cal_max_min(cal_list[0],var)
         # 更新表格为当前主变量和从变量
@@ -1,9 +1,15 @@
 # Filename: FileManager.py
-from PyQt6.QtWidgets import QFileDialog
+from PyQt6.QtWidgets import QFileDialog, QInputDialog
 import os
-import pandas as pd
-import numpy as np
+import time
+import zipfile
 from PyQt6.QtWidgets import QMainWindow
+from service import CsvReader
+from service import CsvLoader
+from service.CsvCache import CsvCache
+from service.CsvLoader import LoadOptions
+from service.FolderIndex import FolderIndex
+from service.ResultCache import ResultCache
 
 class FileManager:
     def __init__(self, main_window: QMainWindow):
@@ -12,14 +18,73 @@ class FileManager:
         self.file_cwd = os.getcwd()
         self.folder_cwd = os.getcwd()
         self.file_path = None
+        # 当前导入的单个文件（压缩包成员为 “压缩包路径::成员路径”）
+        self.current_file = None
         self.folder_path = None
+        # 当前文件夹的索引（manifest），记录每个文件的大小、修改时间、内容哈希、表头结构和批量统计结果
+        self.folder_index = None
         self.csv_files = []
-        self.df = None
+        # 最近一次加载的单个文件和打开的文件夹中第一个文件的结构（含仪器信息）
+        self.schema = None
+        self.folder_schema = None
         self.header_threshold = 8  # 默认阈值，表示列数大于等于 8 的行才是表头
+        # 表头探测只扫描文件前缀，超出前缀未找到时是否再扩大到 FALLBACK_SCAN_SCALE 倍的前缀继续扫描
+        self.header_scan_bytes = CsvReader.DEFAULT_SCAN_BYTES
+        self.header_scan_lines = CsvReader.DEFAULT_SCAN_LINES
+        self.header_scan_fallback = True
+        # 解析引擎：fast / pyarrow / round_trip（与旧版逐位一致但最慢，用于审核）
+        self.engine = CsvReader.DEFAULT_ENGINE
+        # 紧凑存储：列以 float32 保存，内存减半，统计仍按 float64 累加
+        self.compact = False
+        # 解析结果的磁盘缓存，再次打开同一文件时直接读取
+        self.cache_enabled = True
+        self.csv_cache = CsvCache()
+        # 按文件内容寻址的批量统计结果缓存，内容相同的文件（重复拷贝、未改动的文件）直接取结果
+        self.result_cache_enabled = True
+        self.result_cache = ResultCache()
+        # 导出报表时是否按表格的小数点精度四舍五入
+        self.export_rounding = False
 
     def change_header_threshold(self, value):
         self.header_threshold = value
 
+    def set_engine(self, engine):
+        """切换解析引擎，对之后解析的列生效"""
+        self.engine = engine
+        resolved = CsvReader.resolve_engine(engine)
+        if resolved != engine:
+            self.main_window.msg(f"未安装 pyarrow，使用 {resolved} 引擎解析")
+        else:
+            self.main_window.msg(f"解析引擎：{engine}，重新导入文件后生效")
+
+    def set_result_cache_limit(self, megabytes):
+        """修改结果缓存的大小上限（MB），超出的部分立即淘汰"""
+        self.result_cache.max_bytes = megabytes * 1024 ** 2
+        self.result_cache.evict()
+        self.main_window.msg(f"结果缓存上限：{megabytes} MB")
+
+    def set_result_cache_policy(self, policy):
+        """修改结果缓存的淘汰策略：lru（最近最少使用）或 fifo（先写入先淘汰）"""
+        self.result_cache.policy = policy
+        self.main_window.msg(f"结果缓存淘汰策略：{policy}")
+
+    def clear_result_cache(self):
+        self.result_cache.clear()
+        self.main_window.msg("结果缓存已清空")
+
+    def set_compact(self, compact):
+        """切换紧凑存储（float32），对之后加载的文件生效"""
+        self.compact = compact
+        self.main_window.msg(f"紧凑存储（float32）已{'开启' if compact else '关闭'}，重新导入文件后生效")
+
+    def memory_report(self):
+        """输出当前文件已加载列的内存占用"""
+        store = self.main_window.draw.data_analysis.store
+        if store is None:
+            self.main_window.msg("未加载文件")
+            return
+        self.main_window.msg(store.memory_report())
+
     def clear(self):
         self.main_ui.comboBox2_1.clear()
         self.main_ui.comboBox2_2.clear()
@@ -31,97 +96,214 @@ class FileManager:
 
     def loadCSVFile(self):
         """
-        通用方式：先手动读取 CSV 文件的所有行，自动检测到哪一行才是真正的表头；
-        然后用 skiprows + header=0 让 pandas 正式解析该文件。
+        通用方式：流式扫描文件开头自动检测真正的表头行，
+        这里只读取表头填充下拉框，数值列在选择主/从变量后按需解析。
+        也可以直接选择 zip 压缩包，从中挑选一个 csv 文件，不需要先解压。
         """
-        self.file_path = QFileDialog.getOpenFileName(self.main_window, '选择CSV文件', self.file_cwd, 'CSV files(*.csv *.CSV)')
+        self.file_path = QFileDialog.getOpenFileName(self.main_window, '选择CSV文件', self.file_cwd,
+                                                     'CSV files(*.csv *.CSV);;ZIP files(*.zip *.ZIP)')
         if not self.file_path[0]:  # 用户取消
             self.main_window.msg("未选择 csv 文件")
             return
+        csv_path = self.file_path[0]
+        if zipfile.is_zipfile(csv_path):
+            csv_path = self._select_zip_member(csv_path)
+            if csv_path is None:
+                return
 
+        # 导入新文件前停止跟踪上一个文件
+        self.main_window.action_follow.setChecked(False)
         try:
             # 1) 自动检测 CSV 中真正的表头行号
-            self.df = self.load_file(self.file_path[0])
+            store = self.load_file(csv_path)
             self.file_cwd = os.path.dirname(self.file_path[0])
-            self.main_window.msg(f"成功加载数据列表：{self.df.columns.tolist()}")
+            self.main_window.msg(f"成功加载数据列表：{store.columns}")
+            # 根据仪器信息自动设置采样间隔等参数
+            self.main_window.apply_metadata(self.schema.metadata)
 
             # 清空ui中的数据
             self.clear()
             
-            # 5) 将 DataFrame 交给你的数据分析模块
-            self.main_window.draw.data_analysis.set_table_data(self.df)
+            # 5) 将列数据交给你的数据分析模块
+            self.main_window.draw.data_analysis.set_table_data(store)
             table_header = self.main_window.draw.data_analysis.get_table_header()
             self.addComboBoxItems(table_header)
 
-            self.main_window.msg(f"文件 {self.file_path[0]} 加载成功")
+            self.main_window.msg(f"文件 {csv_path} 加载成功")
         except Exception as e:
             print(e)
-            self.main_window.msg(f"文件 {self.file_path[0]} 加载失败")
+            self.main_window.msg(f"文件 {csv_path} 加载失败")
             self.clear()
 
+    def _select_zip_member(self, zip_path):
+        """从压缩包中选择一个 csv 文件，返回其路径（压缩包路径::成员路径），取消返回 None"""
+        members = CsvReader.list_zip_csv(zip_path)
+        if not members:
+            self.main_window.msg(f"压缩包 {zip_path} 中没有 csv 文件")
+            return None
+        member = members[0]
+        if len(members) > 1:
+            member, ok = QInputDialog.getItem(self.main_window, '选择压缩包中的文件', 'csv 文件：', members, 0, False)
+            if not ok:
+                self.main_window.msg("未选择 csv 文件")
+                return None
+        return CsvReader.zip_member_path(zip_path, member)
+
     def load_folder(self):
         """
-        获取文件夹下所有的 csv 文件
+        获取文件夹下所有的 csv 文件（包括文件夹中 zip 压缩包里的 csv 文件）
         """
-        self.folder_path = QFileDialog.getExistingDirectory(self.main_window, '选择文件夹', self.folder_cwd)
-        if not self.folder_path:  # 用户取消
+        folder_path = QFileDialog.getExistingDirectory(self.main_window, '选择文件夹', self.folder_cwd)
+        if not folder_path:  # 用户取消
             self.main_window.msg("未选择文件夹")
             return None
-        self.main_window.msg(f"选择文件夹：{self.folder_path}")
-        self.folder_cwd = self.folder_path
-        self.csv_files = [f for f in os.listdir(self.folder_path) if f.lower().endswith('.csv')]
+        self.main_window.msg(f"选择文件夹：{folder_path}")
+        self.folder_cwd = folder_path
+        return self._open_folder(folder_path)
+
+    def load_zip(self):
+        """
+        把一个 zip 压缩包当作文件夹打开，批量统计时直接从压缩包中流式读取各个 csv 文件
+        """
+        zip_path = QFileDialog.getOpenFileName(self.main_window, '选择压缩包', self.folder_cwd, 'ZIP files(*.zip *.ZIP)')[0]
+        if not zip_path:  # 用户取消
+            self.main_window.msg("未选择压缩包")
+            return None
+        self.main_window.msg(f"选择压缩包：{zip_path}")
+        self.folder_cwd = os.path.dirname(zip_path)
+        return self._open_folder(zip_path)
+
+    def _open_folder(self, folder_path):
+        """
+        递归扫描文件夹，用持久化的文件夹索引得到所有 csv 文件及其表头结构，
+        只有新增或内容变化的文件才会被重新探测。
+        """
+        self.folder_path = folder_path
+        self.folder_index = FolderIndex(folder_path)
+        summary = self.folder_index.refresh(self.load_options())
+        self.csv_files = self.folder_index.files
         if not self.csv_files:
             self.main_window.msg(f"文件夹 {self.folder_path} 下没有 csv 文件")
             return None
         self.main_window.msg(f"文件夹下的 csv 文件：{self.csv_files}")
-        # 获取第一个csv文件的表头
-        df = self.load_file(os.path.join(self.folder_path, self.csv_files[0]))
-        if df is None:
+        self.main_window.msg(f"文件夹索引：共 {summary['共']} 个文件，复用 {summary['复用']} 个，"
+                             f"重新探测 {summary['探测']} 个，移除 {summary['删除']} 个，"
+                             f"读取失败 {summary['失败']} 个，耗时：{summary['耗时'] * 1000:.1f} ms")
+        if self.folder_index.failures:
+            details = "；".join(f"{name}（{reason}）" for name, reason in self.folder_index.failures)
+            self.main_window.msg(f"读取失败的文件：{details}")
+        # 第一个csv文件的表头和仪器信息直接取自索引
+        schema = self.folder_index.schema(self.csv_files[0])
+        self.folder_schema = schema
+        if schema is None:
             self.main_window.msg(f"文件 {self.csv_files[0]} 未找到稳定的表头行，请修改检测阈值")
             return None
-        return df.columns.tolist()
+        return schema.numeric_columns
+
+    def csv_path(self, csv_file) -> str:
+        """csv_files 中的文件名（相对路径）对应的完整路径"""
+        return self.folder_index.csv_path(csv_file)
+
+    def folder_file_schema(self, csv_file):
+        """文件夹中文件的表头结构（取自文件夹索引），找不到表头返回 None"""
+        if not self.folder_index.matches(self.load_options()):
+            # 打开文件夹之后又修改了检测阈值，索引中的结构已过期，直接探测
+            return self.probe_schema(self.csv_path(csv_file))
+        return self.folder_index.schema(csv_file)
+
+    def probe_schema(self, csv_path):
+        """
+        只探测表头和数值列，返回 CsvSchema，找不到表头返回 None。
+        启用缓存时结构按 (路径, 大小, 修改时间, 阈值) 缓存，文件未改动时不再读取文件。
+        """
+        loaded = CsvLoader.load_schema(csv_path,
+                                       self.load_options(),
+                                       self.csv_cache if self.cache_enabled else None)
+        return None if loaded is None else loaded[0]
         
+    def load_options(self) -> LoadOptions:
+        """当前的加载参数，批量统计时传给子进程"""
+        return LoadOptions(self.header_threshold,
+                           self.header_scan_bytes,
+                           self.header_scan_lines,
+                           self.header_scan_fallback,
+                           self.engine,
+                           self.compact)
+
     def load_file(self, folder_path):
-         # 1) 自动检测 CSV 中真正的表头行号
-        header_line_index = self._detect_header_line_by_colcount(folder_path)
-        if header_line_index is None:
+        """
+        只探测表头和数值列，不解析数据；返回惰性 ColumnStore，
+        某一列第一次被访问（绘图、计算平均值等）时才解析该列，之后缓存在 store 中。
+        启用缓存时表头结构和解析过的列都会写入磁盘，文件未改动时再次打开直接映射。
+        找不到表头时返回 None。
+        """
+        t0 = time.perf_counter()
+        opened = CsvLoader.open_store(folder_path,
+                                      self.load_options(),
+                                      self.csv_cache if self.cache_enabled else None,
+                                      on_parse=self._log_parse)
+        if opened is None:
             # 如果检测不到合适的表头行，你可以选择报错或给个默认值
             return None
-        self.main_window.msg(f"检测文件{folder_path}到表头行号：{header_line_index} 行。")
-        # 2) 用 skiprows 指定要跳过的行，让 pandas 从检测到的那行开始当作表头
-        self.df = pd.read_csv(
-            folder_path,
-            skiprows=header_line_index,  # 跳过前 header_line_index 行
-            header=0,                    # 让这一行成为 columns
-            float_precision='round_trip',
-            skip_blank_lines=True
-        )
-
-        # 3) 替换表头中的特殊符号
-        self._clean_special_symbols_in_columns()
-
-        # 4) 删除全部为 NaN 的行（如果有多余空行）
-        self.df.dropna(axis=0, how='all', inplace=True)
-        # ★ 只保留数值型的列（float / int）
-        return self.df.select_dtypes(include=[np.number])
-
-    
+        store, schema = opened
+        self.schema = schema
+        self.current_file = folder_path
+        self.main_window.msg(f"检测文件{folder_path}到表头行号：{schema.header_index} 行。")
+        self.main_window.msg(f"表头读取耗时：{(time.perf_counter() - t0) * 1000:.1f} ms")
+        return store
+
+    def _log_parse(self, name, seconds, engine, data_bytes):
+        """记录每一列的解析引擎、耗时和吞吐量"""
+        speed = data_bytes / 1024 ** 2 / seconds if seconds > 0 else float('inf')
+        self.main_window.msg(f"解析列 {name}（{engine}）耗时：{seconds * 1000:.1f} ms，{speed:.1f} MB/s")
+
+    # 导出格式：文件对话框的过滤器 -> 扩展名
+    EXPORT_FILTERS = {
+        'CSV 文件(*.csv)': '.csv',
+        'Parquet 文件(*.parquet)': '.parquet',
+        'Excel 文件(*.xlsx)': '.xlsx',
+    }
+
+    def set_export_rounding(self, rounding):
+        """导出时是否按表格的小数点精度四舍五入（默认导出完整精度）"""
+        self.export_rounding = rounding
+        self.main_window.msg(f"导出{'按表格小数点精度四舍五入' if rounding else '保持完整精度'}")
 
     def saveCSVFile(self):
-        save_path = QFileDialog.getSaveFileName(self.main_window, '保存 CSV 文件', '', 'CSV files(*.csv)')
-        if not save_path[0]:  # 用户取消
+        """导出报表：数值直接取自统计结果，可保存为 CSV、Parquet 或 Excel"""
+        save_path, selected = QFileDialog.getSaveFileName(self.main_window, '导出报表', '',
+                                                          ';;'.join(self.EXPORT_FILTERS))
+        if not save_path:  # 用户取消
             self.main_window.msg("未选择保存路径")
             return
+        report_table = self.main_window.draw.report_table
+        df = report_table.report_frame(report_table.precision if self.export_rounding else None)
+        if df is None:
+            self.main_window.msg("表格为空，没有可导出的数据")
+            return
+        # 优先按文件扩展名确定格式，没有扩展名时使用对话框中选择的格式
+        ext = os.path.splitext(save_path)[1].lower()
+        if ext not in self.EXPORT_FILTERS.values():
+            ext = self.EXPORT_FILTERS.get(selected, '.csv')
+            save_path += ext
+        t0 = time.perf_counter()
         try:
-            table_data = self.main_window.draw.report_table.get_all_table_data()
-            # 将数据转换为 DataFrame
-            df = pd.DataFrame(table_data[1:], columns=table_data[0])  # 第一行是表头
-            # 保存 CSV
-            df.to_csv(save_path[0], index=False, encoding="utf-8-sig")  # 防止乱码
-            self.main_window.msg(f"文件 {save_path[0]} 保存成功")
+            if ext == '.parquet':
+                df.to_parquet(save_path, index=False)
+            elif ext == '.xlsx':
+                df.to_excel(save_path, index=False)
+            else:
+                df.to_csv(save_path, index=False, encoding="utf-8-sig")  # 防止乱码
+        except ImportError as e:
+            # Parquet 需要 pyarrow，Excel 需要 openpyxl
+            self.main_window.msg(f"文件 {save_path} 保存失败，缺少依赖：{e}")
+            return
         except Exception as e:
             print(e)
-            self.main_window.msg(f"文件 {save_path[0]} 保存失败")
+            self.main_window.msg(f"文件 {save_path} 保存失败")
+            return
+        self.main_window.msg(f"文件 {save_path} 保存成功，共 {len(df)} 行，"
+                             f"耗时：{(time.perf_counter() - t0) * 1000:.1f} ms")
 
     def addComboBoxItems(self, items: list):
         self.main_ui.comboBox2_1.addCheckableItems(items)
@@ -130,85 +312,3 @@ class FileManager:
         self.main_ui.comboBox2_2.addCheckableItems(items)
         self.main_ui.comboBox2_2.setCurrentIndex(-1)  # 设置默认不选中任何选项
         self.main_ui.comboBox2_2.lineEdit().clear()  # 确保 lineEdit 初始状态为空
-        
-
-    # -------------------------------------------------------
-    # 下面是通用的“自动检测表头行”函数 & 表头符号清洗函数
-    # -------------------------------------------------------
-
-    def _detect_header_line_by_colcount(self, csv_path):
-        """
-        从 CSV 文件开头逐行扫描，尝试找到最可能的表头所在行。
-        策略：
-          1) 忽略空行或只有少数列的行。
-          2) 找到第一行，其列数较多(>=某阈值) 并且后面若干行的列数也一致或相似，
-             则判定它为表头行。
-        返回：
-          - 如果找到，返回该行在文件中的“索引”（从 0 开始）
-          - 如果找不到，返回 None
-        """
-        lines = []
-        # 先把文件整行读进来，存储到 list 中
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        # 统计每一行的列数
-        col_counts = []
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            # 跳过空行
-            if not line_stripped:
-                col_counts.append(0)
-                continue
-            # 分割逗号，统计列数
-            columns = line_stripped.split(',')
-            col_counts.append(len(columns))
-
-        # 这里给一个简化逻辑：找“第一个显著大于 1 的列数”，
-        # 并且后面紧邻的几行也保持相似列数(±0或±1都算)，则视为表头。
-        # 你也可以改成“找最大列数”或者别的更复杂判断。
-        for i in range(len(col_counts)):
-            c = col_counts[i]
-            if c > self.header_threshold: # 举个例子，假设列数大于 15 就是表头
-                # 检查后面若干行，如果列数也和 c 差不多，就认为是表头行
-                # 这里简单判断下一行也有同样列数就通过
-                if i + 1 < len(col_counts) and col_counts[i+1] == c:
-                    return i
-                # 或者可放宽判断：绝大部分后续行都 == c 时即可
-                # if self._check_consistent_after(i, col_counts):
-                #     return i
-
-        return None
-
-    # 如果想更严格地判断，可以再写一个辅助函数检查后续若干行的一致性
-    # def _check_consistent_after(self, start_index, col_counts, tolerance=0):
-    #     """
-    #     判断从 start_index 之后的多行，是否都与 col_counts[start_index] 相同
-    #     （或在某个范围内）。
-    #     """
-    #     base = col_counts[start_index]
-    #     # 先只简单看看后面 5 行
-    #     for j in range(start_index+1, min(start_index+6, len(col_counts))):
-    #         if abs(col_counts[j] - base) > tolerance:
-    #             return False
-    #     return True
-
-    def _clean_special_symbols_in_columns(self):
-        """
-        清洗表头中不需要的符号，比如 λ、Σ 等。
-        也可以在这里添加更多针对表头的清理逻辑。
-        """
-        if self.df is None or self.df.empty:
-            return
-
-        replace_map = {
-            'λ': '_lambda_',
-            'Σ': '_sigma_',
-            # 需要别的替换可自行补充
-        }
-        new_columns = []
-        for col in self.df.columns:
-            for old, new in replace_map.items():
-                col = col.replace(old, new)
-            new_columns.append(col)
-        self.df.columns = new_columns
@@ -0,0 +1,246 @@
+# FolderIndex.py
+# 文件夹索引（manifest）：递归扫描文件夹中的 csv 文件，记录每个文件的大小、修改时间、内容哈希和表头结构，
+# 持久化到磁盘，再次打开同一文件夹时只重新探测有变化的文件
+import os
+import json
+import time
+import hashlib
+import zipfile
+from service import CsvReader
+from service.CsvReader import CsvSchema
+from service.CsvLoader import LoadOptions, probe_signature
+
+MANIFEST_VERSION = 1
+
+
+def default_manifest_dir():
+    """索引目录，与磁盘缓存一样放在 APPDATA/DataAna 下"""
+    base = os.getenv('APPDATA') or os.path.expanduser('~')
+    return os.path.join(base, "DataAna", "manifests")
+
+
+def _json_value(value):
+    """统计结果中的 numpy 标量转成 python 数值再写入 json"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class FolderIndex:
+    """
+    一个文件夹（或当作文件夹打开的 zip 压缩包）的索引，保存在 manifest_dir/<文件夹路径哈希>.json。
+    每个 csv 文件一条记录：相对路径、大小、修改时间 ns、内容哈希、表头结构（含表头行号和仪器信息），
+    以及批量统计的结果（按 统计参数 为键）。
+    refresh() 递归扫描文件夹：大小和修改时间都没变的文件直接复用记录，变了的文件只重新探测表头。
+    打开文件夹时不读取整个文件，内容哈希由批量统计的子进程在读文件时顺便算出，再经 store_stats 记入索引。
+    子文件夹中的 zip 压缩包展开为 “压缩包相对路径::成员路径”。
+    """
+    def __init__(self, folder_path, manifest_dir=None):
+        self.folder_path = os.path.abspath(folder_path)
+        self.manifest_dir = manifest_dir or default_manifest_dir()
+        key = hashlib.sha1(self.folder_path.encode('utf-8')).hexdigest()
+        self.manifest_path = os.path.join(self.manifest_dir, f"{key}.json")
+        self.entries = {}
+        self.signature = None
+        # 最近一次 refresh 中扫描或探测失败的 (相对路径, 原因)
+        self.failures = []
+        self._load()
+
+    @property
+    def is_archive(self) -> bool:
+        return os.path.isfile(self.folder_path)
+
+    @property
+    def files(self) -> list:
+        """按相对路径排序的全部 csv 文件"""
+        return sorted(self.entries)
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data["version"] != MANIFEST_VERSION or data["folder"] != self.folder_path:
+                raise ValueError("索引版本或路径不一致")
+            self.signature = data["signature"]
+            self.entries = data["files"]
+        except (OSError, ValueError, KeyError):
+            # 没有索引或索引损坏，从头建立
+            self.entries = {}
+            self.signature = None
+
+    def save(self):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "folder": self.folder_path,
+            "signature": self.signature,
+            "files": self.entries,
+        }
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    def csv_path(self, name) -> str:
+        """相对路径对应的完整路径（压缩包成员为 “压缩包路径::成员路径”）"""
+        if self.is_archive:
+            return CsvReader.zip_member_path(self.folder_path, name)
+        return os.path.join(self.folder_path, name)
+
+    def relative_path(self, csv_path) -> str:
+        """完整路径对应的相对路径，与 files 中的名字一致"""
+        if self.is_archive:
+            return CsvReader.split_source(csv_path)[1]
+        # 子文件夹中的压缩包成员：只对压缩包路径求相对路径，成员路径保持 “/” 分隔，与 scan 中的名字一致
+        archive, member = CsvReader.split_source(csv_path)
+        name = os.path.relpath(archive, self.folder_path)
+        return name if member is None else CsvReader.zip_member_path(name, member)
+
+    def _scan_failed(self, name, error):
+        """记录扫描或探测失败的文件（或子文件夹、压缩包）及原因，格式与批量统计的失败记录一致"""
+        self.failures.append((name, f"{type(error).__name__}: {error}"))
+
+    def _scan_zip(self, zip_path, prefix):
+        """压缩包中的 csv 成员：大小为解压后的大小，修改时间取压缩包的修改时间"""
+        try:
+            mtime_ns = os.stat(zip_path).st_mtime_ns
+            with zipfile.ZipFile(zip_path) as z:
+                members = [(info.filename, info.file_size) for info in z.infolist()
+                           if not info.is_dir() and info.filename.lower().endswith('.csv')]
+        except (OSError, zipfile.BadZipFile) as error:
+            self._scan_failed(prefix or os.path.basename(zip_path), error)
+            return
+        for member, size in members:
+            yield CsvReader.zip_member_path(prefix, member) if prefix else member, size, mtime_ns
+
+    def _scan_dir(self, folder, prefix=""):
+        """
+        os.scandir 递归遍历，产出 (相对路径, 大小, 修改时间 ns)，不跟随指向目录的符号链接。
+        没有权限的子文件夹、损坏的压缩包等记入 failures 后跳过，不影响其他文件。
+        """
+        try:
+            with os.scandir(folder) as it:
+                items = list(it)
+        except OSError as error:
+            self._scan_failed(prefix or folder, error)
+            return
+        for item in items:
+            name = os.path.join(prefix, item.name) if prefix else item.name
+            lower = item.name.lower()
+            try:
+                if item.is_dir(follow_symlinks=False):
+                    found = self._scan_dir(item.path, name)
+                elif lower.endswith('.csv'):
+                    stat = item.stat()
+                    found = [(name, stat.st_size, stat.st_mtime_ns)]
+                elif lower.endswith('.zip') and zipfile.is_zipfile(item.path):
+                    found = self._scan_zip(item.path, name)
+                else:
+                    continue
+            except OSError as error:
+                self._scan_failed(name, error)
+                continue
+            yield from found
+
+    def scan(self):
+        if self.is_archive:
+            yield from self._scan_zip(self.folder_path, "")
+        else:
+            yield from self._scan_dir(self.folder_path)
+
+    def refresh(self, options: LoadOptions, on_probe=None) -> dict:
+        """
+        重新扫描文件夹并更新索引，只探测新增或内容有变化的文件，结束后写回磁盘。
+        on_probe(相对路径) 在每次真正探测一个文件前调用。
+        单个文件读取失败（编码不对、压缩包成员损坏或加密、没有读权限等）不会中断扫描：
+        该文件的表头结构记为 None 并记下原因，所有失败的 (相对路径, 原因) 汇总在 failures 中。
+        返回 {"共": 文件数, "复用": .., "探测": .., "删除": .., "失败": .., "耗时": 秒}
+        """
+        t0 = time.perf_counter()
+        signature = probe_signature(options)
+        same_signature = signature == self.signature
+        old_entries = self.entries
+        entries = {}
+        reused = probed = 0
+        self.failures = []
+        for name, size, mtime_ns in self.scan():
+            old = old_entries.get(name)
+            if old is not None and same_signature and old["size"] == size and old["mtime_ns"] == mtime_ns:
+                entries[name] = old
+                reused += 1
+                continue
+            if on_probe is not None:
+                on_probe(name)
+            error = None
+            try:
+                schema = CsvReader.probe_schema(self.csv_path(name),
+                                                options.header_threshold,
+                                                scan_bytes=options.scan_bytes,
+                                                scan_lines=options.scan_lines,
+                                                fallback=options.fallback)
+            except Exception as exc:  # 一个文件读不了不影响其他文件
+                schema, error = None, f"{type(exc).__name__}: {exc}"
+            entries[name] = {
+                "size": size,
+                "mtime_ns": mtime_ns,
+                # 内容哈希在批量统计时才计算
+                "hash": None,
+                "schema": None if schema is None else schema.to_dict(),
+                "error": error,
+                "stats": {},
+            }
+            probed += 1
+        # 复用的记录中也可能有上次读取失败的文件
+        self.failures += [(name, entry["error"]) for name, entry in sorted(entries.items()) if entry.get("error")]
+        removed = len(set(old_entries) - set(entries))
+        self.entries = entries
+        self.signature = signature
+        self.save()
+        return {"共": len(entries), "复用": reused, "探测": probed, "删除": removed,
+                "失败": len(self.failures), "耗时": time.perf_counter() - t0}
+
+    def matches(self, options: LoadOptions) -> bool:
+        """索引中的表头结构是否是按这组参数探测的"""
+        return probe_signature(options) == self.signature
+
+    def schema(self, name):
+        """文件的表头结构，找不到表头、读取失败或不在索引中时返回 None"""
+        entry = self.entries.get(name)
+        if entry is None or entry["schema"] is None:
+            return None
+        return CsvSchema.from_dict(entry["schema"])
+
+    @staticmethod
+    def stats_key(var_list, cal_type, moments, options: LoadOptions) -> str:
+        """批量统计结果的键：变量、统计类型、是否计算标准差/均方根、表头探测参数、实际解析引擎和存储精度"""
+        return json.dumps([list(var_list), cal_type, bool(moments), probe_signature(options),
+                           CsvReader.resolve_engine(options.engine), options.compact], ensure_ascii=False)
+
+    def _current_entry(self, csv_path):
+        """文件在索引中的记录；索引建立之后文件又被修改过（大小或修改时间不同）时返回 None"""
+        entry = self.entries.get(self.relative_path(csv_path))
+        if entry is None:
+            return None
+        try:
+            size, mtime_ns = CsvReader.stat_source(csv_path)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+        if size != entry["size"] or mtime_ns != entry["mtime_ns"]:
+            return None
+        return entry
+
+    def content_digest(self, csv_path):
+        """索引中记录的内容哈希，还没有算过或文件在索引建立后又被修改过时返回 None"""
+        entry = self._current_entry(csv_path)
+        return None if entry is None else entry["hash"]
+
+    def cached_stats(self, csv_path, key):
+        """未变化文件的批量统计结果，没有时返回 None"""
+        entry = self._current_entry(csv_path)
+        return None if entry is None else entry["stats"].get(key)
+
+    def store_stats(self, csv_path, key, row: dict, digest=None):
+        """记录一个文件的批量统计结果和子进程算出的内容哈希（调用 save() 后写入磁盘）"""
+        entry = self._current_entry(csv_path)
+        if entry is not None:
+            entry["stats"][key] = {name: _json_value(value) for name, value in row.items()}
+            if digest is not None:
+                entry["hash"] = digest
@@ -110,6 +110,18 @@ class ReferenceLineManager:
         elif act == "u":
             self.set_jumps(jump)
 
+    def append_data(self, y_value, jumps):
+        """
+        数据末尾追加了新行：更新数据和可吸附的位置，只为新增的突变点添加参考线，
+        用户拖动、删除或手动添加过的参考线保持不变。
+        """
+        self.y_value = y_value
+        self.xpos_list = range(len(y_value))
+        new_jumps = [jump for jump in jumps if jump not in self._jumps]
+        for jump in new_jumps:
+            self.add_line(jump)
+        self.jumps = self._jumps + new_jumps  # 使用 property 的 setter 触发自动更新
+
     def update_stable_interval(self):
         """更新稳定区间"""
         self.stable_interval.clear() # 清空稳定区间
@@ -118,7 +130,8 @@ class ReferenceLineManager:
         # 检查 jumps 是否为空
         if not jumps:
             # 通知折线管理器,表格更新
-            self.update_lines_table(self.stable_interval)
+            self.update_lines(self.stable_interval)
+            self.update_table(self.stable_interval)
             return
 
         # 确保第一个突变点不会导致前死区小于0
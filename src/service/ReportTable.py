@@ -1,3 +1,4 @@
+import pandas as pd
 from PyQt6.QtWidgets import QAbstractItemView, QHeaderView, QAbstractScrollArea, QTableWidgetItem, QMenu, QApplication, QMessageBox
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QKeySequence
@@ -13,6 +14,8 @@ class ReportTable:
         # 小数点精度
         self._precision = 2
         self.cal_list = []
+        # 表格显示的是文件夹批量统计结果时保存其原始数值（BatchEngine.table_data），否则为 None
+        self.batch_data = None
 
 
         # 设置表格大小调整为内容适应
@@ -51,6 +54,7 @@ class ReportTable:
     def update_table(self, cal_list:list):
         """更新表格数据"""
         self.cal_list = cal_list
+        self.batch_data = None
         for i in cal_list:
             if i not in self.table_data:
                     self.table_data[i] = {"avg": [], "max_min": []}
@@ -71,6 +75,13 @@ class ReportTable:
             self.data_analysis.get_table_columns()
         else:
             self.add_column("稳定阶段", [f"{interval[0]} - {interval[1]}" for interval in self.data_analysis.stable_interval[cal_list[0]]])
+        # 勾选时间轴且文件带有时间戳时，给出稳定阶段的真实起止时间
+        elapsed = self.data_analysis.get_elapsed_time() if self.main_ui.checkBox_3.isChecked() else None
+        if elapsed is not None:
+            intervals = self.data_analysis.stable_interval[cal_list[0]] or [(0, len(elapsed) - 1)]
+            last = len(elapsed) - 1
+            self.add_column("起止时间[s]", [f"{elapsed[min(start, last)]:.3f} - {elapsed[min(end, last)]:.3f}"
+                                           for start, end in intervals])
         # 添加第二列主次变量得参数 名称+平均值 在前面
         for i in cal_list:
             self.add_column(f"{i} 平均值", self.table_data[i]["avg"])
@@ -87,6 +98,7 @@ class ReportTable:
 
     def update_csv_table(self, table_data:dict):
         """更新表格数据"""
+        self.batch_data = table_data
         self.clear_all_columns()
         for key,value in table_data.items():
             # 检查列表是否为数值列表，如果是则保留小数点精度
@@ -94,6 +106,39 @@ class ReportTable:
                 value = [format(round(val, self.precision),f'.{self.precision}f') for val in value]
             self.add_column(key, value)
 
+    def report_frame(self, decimals=None):
+        """
+        当前表格内容对应的数值报表，直接由统计结果（DataAnalysis 或批量统计结果）生成，不读取单元格文本，
+        数值保持完整精度；decimals 不为 None 时浮点列按该位数四舍五入。表格为空时返回 None。
+        """
+        if self.table.columnCount() == 0 or self.table.rowCount() == 0:
+            return None
+        if self.batch_data is not None:
+            df = pd.DataFrame(self.batch_data)
+        else:
+            df = self._analysis_frame(self.cal_list)
+        return df if decimals is None else df.round(decimals)
+
+    def _analysis_frame(self, cal_list:list):
+        """单文件稳定阶段统计，列顺序与 show_data 一致，稳定阶段和起止时间拆成起点、终点两列"""
+        intervals = self.data_analysis.stable_interval[cal_list[0]] or [(0, self.data_analysis.get_table_num() - 1)]
+        columns = {"稳定阶段起点": [interval[0] for interval in intervals],
+                   "稳定阶段终点": [interval[1] for interval in intervals]}
+        elapsed = self.data_analysis.get_elapsed_time() if self.main_ui.checkBox_3.isChecked() else None
+        if elapsed is not None:
+            last = len(elapsed) - 1
+            columns["起始时间[s]"] = [elapsed[min(start, last)] for start, _ in intervals]
+            columns["结束时间[s]"] = [elapsed[min(end, last)] for _, end in intervals]
+        for i in cal_list:
+            columns[f"{i} 平均值"] = self.data_analysis.data_avg[i]
+        for i in cal_list:
+            max_min = self.data_analysis.data_max_min[i]
+            columns[f"{i} 最大值索引"] = [item[1] for item in max_min]
+            columns[f"{i} 最大值"] = [item[0] for item in max_min]
+            columns[f"{i} 最小值索引"] = [item[3] for item in max_min]
+            columns[f"{i} 最小值"] = [item[2] for item in max_min]
+        return pd.DataFrame(columns)
+
     def show_context_menu(self, position):
         """显示右键菜单"""
         menu = QMenu(self.table)
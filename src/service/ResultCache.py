@@ -0,0 +1,129 @@
+# ResultCache.py
+# 按文件内容寻址的分析结果缓存：键是文件内容哈希 + 分析参数，内容相同的文件（重复拷贝、未改动的文件）直接取结果
+import os
+import json
+import shutil
+import hashlib
+from service import CsvReader
+from service.CsvLoader import probe_signature
+
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2  # 结果缓存总大小上限 64 MB
+POLICIES = ('lru', 'fifo')
+
+
+def default_result_dir():
+    """结果缓存目录，与 CsvCache 一样放在 APPDATA/DataAna 下"""
+    base = os.getenv('APPDATA') or os.path.expanduser('~')
+    return os.path.join(base, "DataAna", "results")
+
+
+def analysis_params(kind, digest, options, **params) -> dict:
+    """
+    一次分析的完整参数：分析类型、文件内容哈希，加上影响结果的加载参数（表头检测、解析引擎、存储精度）
+    和调用方给出的分析参数（变量、统计类型、是否计算标准差等）。
+    """
+    return {
+        "kind": kind,
+        "hash": digest,
+        "header": probe_signature(options),
+        "engine": CsvReader.resolve_engine(options.engine),
+        "compact": options.compact,
+        **params,
+    }
+
+
+def _json_value(value):
+    """numpy 标量转成 python 数值，元组转成列表，便于写入 json"""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _json_value(v) for k, v in value.items()}
+    return value
+
+
+class ResultCache:
+    """
+    每条结果一个 json 文件，文件名是 参数（含内容哈希）的 sha1。
+    参数相同、文件内容相同的分析（不论文件路径、所在文件夹）直接返回缓存的结果，不再解析和计算。
+    总大小超过 max_bytes 时按 policy 淘汰：'lru' 按最近访问时间，'fifo' 按写入时间（读取不刷新）。
+    可以在多个进程中同时使用（先写临时文件再改名）。
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, policy='lru'):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的淘汰策略 {policy}")
+        self.cache_dir = cache_dir or default_result_dir()
+        self.max_bytes = max_bytes
+        self.policy = policy
+        # 估计的缓存总大小，只有超过上限时才扫描目录
+        self._total = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return hashlib.sha1(json.dumps(_json_value(params), sort_keys=True, ensure_ascii=False)
+                            .encode('utf-8')).hexdigest()
+
+    def _path(self, params):
+        return os.path.join(self.cache_dir, f"{self.key(params)}.json")
+
+    def get(self, params: dict):
+        """取缓存的结果，未命中返回 None"""
+        path = self._path(params)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data["params"] != _json_value(params):
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        if self.policy == 'lru':
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return data["value"]
+
+    def put(self, params: dict, value):
+        """写入一条结果（结果中的元组读回来是列表）"""
+        path = self._path(params)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"params": _json_value(params), "value": _json_value(value)}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        if self._total is not None:
+            self._total += os.path.getsize(path)
+        if self._total is None or self._total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """总大小超过上限时，从最旧的条目开始删除（lru 按访问时间，fifo 按写入时间）"""
+        entries = []
+        total = 0
+        for item in os.scandir(self.cache_dir):
+            if not item.is_file() or not item.name.endswith('.json'):
+                continue
+            stat = item.stat()
+            entries.append((stat.st_mtime if self.policy == 'lru' else stat.st_ctime, stat.st_size, item.path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total = total
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total = 0
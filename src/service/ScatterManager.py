@@ -1,4 +1,5 @@
 import mplcursors
+import numpy as np
 from matplotlib.backend_bases import PickEvent, KeyEvent
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
@@ -32,16 +33,18 @@ class ScatterManager:
         y_value: y轴数据值列表
         color: 初始颜色，默认为灰色
         delt_T: x轴缩放因子，默认为1
+        time_axis: 每个点的真实时间（秒），设置后斜率按真实时间计算，优先于 delt_T
     """
     
     def __init__(self, label: str, ax, y_value: List[float], 
-                 color: str = 'gray', delt_T: float = 1):
+                 color: str = 'gray', delt_T: float = 1, time_axis=None):
         """初始化散点管理器"""
         self.label = label
         self.ax = ax
         self.y_value = y_value
         self._color = color
         self._delt_T = delt_T  # x轴索引到实际值的转换因子
+        self._time_axis = time_axis  # 每个点的真实时间，None 表示使用 delt_T
         self.scatter = None     # 散点图对象
         self.lines = []        # 存储所有LineInfo对象的列表
         self.selected_points = []  # 临时存储选中的点索引
@@ -92,6 +95,29 @@ class ScatterManager:
         self._delt_T = value
         self._update_all_lines()  # 更新所有线条位置和斜率文本
 
+    @property
+    def time_axis(self):
+        """获取每个点的真实时间（秒），未设置时为 None"""
+        return self._time_axis
+
+    @time_axis.setter
+    def time_axis(self, value):
+        """设置每个点的真实时间并更新所有斜率文本
+
+        Args:
+            value: 与 y_value 等长的时间数组（秒），None 表示使用 delt_T
+        """
+        if value is self._time_axis:
+            return
+        self._time_axis = value
+        self._update_all_lines()
+
+    def _x(self, index: int) -> float:
+        """点索引对应的x值：有真实时间时取真实时间，否则为 索引 * delt_T"""
+        if self._time_axis is not None:
+            return float(self._time_axis[index])
+        return index * self.delt_T
+
     @property
     def visible(self) -> bool:
         """获取当前可见性状态"""
@@ -143,6 +169,16 @@ class ScatterManager:
         )
         self._setup_hover()     # 设置悬停提示
 
+    def set_data(self, y_value):
+        """数据末尾追加了新行时更新散点，已画的斜率线保持不变
+
+        Args:
+            y_value: 新的y轴数据（前面的部分与原数据相同）
+        """
+        self.y_value = y_value
+        self.scatter.set_offsets(np.column_stack((np.arange(len(y_value)), y_value)))
+        self.ax.figure.canvas.draw_idle()
+
     def _connect_events(self):
         """连接所有必要的事件处理器"""
         self.ax.figure.canvas.mpl_connect('pick_event', self._on_pick)
@@ -165,7 +201,7 @@ class ScatterManager:
         
         # 获取选中点的索引和坐标
         i1, i2 = self.selected_points
-        x1, x2 = i1 * self.delt_T, i2 * self.delt_T
+        x1, x2 = self._x(i1), self._x(i2)
         y1, y2 = self.y_value[i1], self.y_value[i2]
         
         # 计算斜率（处理除零情况）
@@ -228,7 +264,7 @@ class ScatterManager:
         for line_info in self.lines:
             i1, i2 = line_info.indices
             # 计算新的坐标
-            x1, x2 = i1 * self.delt_T, i2 * self.delt_T
+            x1, x2 = self._x(i1), self._x(i2)
             y1, y2 = self.y_value[i1], self.y_value[i2]
             
             # 更新直线位置
@@ -0,0 +1,62 @@
+# SensitivityMap.py
+# 突变检测的灵敏度图：不同窗口、不同阈值下检测到的突变点个数
+from typing import Callable
+import numpy as np
+from PyQt6.QtWidgets import QDialog, QVBoxLayout
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.colors import SymLogNorm
+from matplotlib.figure import Figure
+
+# 灵敏度图的阈值采样点数
+THRESHOLD_STEPS = 60
+
+
+def sensitivity_windows(window, steps=9, spread=4.0):
+    """当前窗口附近按比例取的一组窗口（window / spread 到 window * spread，至少为 2），从小到大排列"""
+    windows = np.round(max(window, 2) * spread ** np.linspace(-1, 1, steps)).astype(np.int64)
+    return np.unique(np.maximum(windows, 2))
+
+
+class SensitivityMap(QDialog):
+    def __init__(self, parent, on_select: Callable):
+        """
+        灵敏度图窗口：横轴为阈值，纵轴为窗口，颜色为突变点个数（对数色标），红点是当前的窗口和阈值。
+        点击某一格时调用 on_select(窗口, 阈值)。
+        """
+        super().__init__(parent)
+        self.setWindowTitle("突变检测灵敏度图")
+        self.resize(640, 400)
+        self.on_select = on_select
+        self.figure = Figure(figsize=(6.4, 4), dpi=100)
+        self.canvas = FigureCanvas(self.figure)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.canvas)
+        self.canvas.mpl_connect('button_press_event', self.on_press)
+        self.windows = None
+        self.thresholds = None
+
+    def update_map(self, title, windows, thresholds, grid, window, threshold):
+        """按 DataAnalysis.jump_count_grid 的结果 grid（窗口数, 阈值数）重画"""
+        self.windows, self.thresholds = windows, thresholds
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        # 每个窗口占一行，阈值取采样点之间的中点作为格子边界
+        edges = np.concatenate(([thresholds[0]], (thresholds[1:] + thresholds[:-1]) / 2, [thresholds[-1]]))
+        mesh = ax.pcolormesh(edges, np.arange(len(windows) + 1) - 0.5, grid, cmap='viridis',
+                             norm=SymLogNorm(linthresh=1, vmin=0, vmax=max(int(grid.max()), 1)))
+        self.figure.colorbar(mesh, ax=ax, label="突变点个数")
+        ax.set_yticks(np.arange(len(windows)), [str(w) for w in windows])
+        ax.set_xlabel("突变识别阈值")
+        ax.set_ylabel("窗口")
+        ax.set_title(title, fontsize=9)
+        if window in windows:
+            ax.plot(threshold, int(np.searchsorted(windows, window)), 'o', color='red', markersize=5)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def on_press(self, event):
+        if event.inaxes is None or self.windows is None or event.inaxes is not self.figure.axes[0]:
+            return
+        row = int(np.clip(round(event.ydata), 0, len(self.windows) - 1))
+        threshold = float(np.clip(event.xdata, self.thresholds[0], self.thresholds[-1]))
+        self.on_select(int(self.windows[row]), threshold)
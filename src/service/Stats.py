@@ -0,0 +1,360 @@
+# Stats.py
+# 与界面无关的统计函数，既在界面中使用，也在批量统计的子进程中使用
+import numpy as np
+
+
+def mean(values):
+    """均值，忽略 NaN；没有 NaN 时直接在视图上计算，不产生拷贝。float32 列也按 float64 累加"""
+    result = values.mean(dtype=np.float64) if len(values) else np.nan
+    if np.isnan(result) and len(values):
+        result = np.nanmean(values, dtype=np.float64)
+    return result
+
+
+def max_min(values, offset=0):
+    """返回 (最大值, 最大值索引, 最小值, 最小值索引)，忽略 NaN，索引加上 offset 换算成全局位置"""
+    if not len(values):
+        return (np.nan, np.nan, np.nan, np.nan)
+    max_index, min_index = values.argmax(), values.argmin()
+    max_value, min_value = values[max_index], values[min_index]
+    if np.isnan(max_value) or np.isnan(min_value):
+        # 含有 NaN，退回忽略 NaN 的版本
+        if np.isnan(values).all():
+            return (np.nan, np.nan, np.nan, np.nan)
+        max_index, min_index = np.nanargmax(values), np.nanargmin(values)
+        max_value, min_value = values[max_index], values[min_index]
+    return (np.float64(max_value), offset + int(max_index), np.float64(min_value), offset + int(min_index))
+
+
+def interval_means(values, intervals):
+    """
+    每个区间 values[a:b] 的均值（区间按切片的规则解释，空区间为 NaN，忽略 NaN），返回 float64 数组。
+    区间按顺序且互不重叠（稳定区间通常如此）时，用一次 np.add.reduceat 求出所有区间的和，不再逐个切片求均值；
+    否则逐个区间求和。含有 NaN 的区间退回 mean。
+    """
+    n = len(values)
+    bounds = np.array([slice(a, b).indices(n)[:2] for a, b in intervals], dtype=np.int64).reshape(-1, 2)
+    counts = bounds[:, 1] - bounds[:, 0]
+    valid = counts > 0
+    means = np.full(len(bounds), np.nan)
+    edges = bounds[valid].ravel()
+    if not len(edges):
+        return means
+    if (np.diff(edges) >= 0).all():
+        # 相邻两个边界之间依次是区间（偶数位）和区间之间的空隙（奇数位），最后一段是最后一个区间
+        sums = np.add.reduceat(values[edges[0]:edges[-1]], edges[:-1] - edges[0], dtype=np.float64)[::2]
+    else:
+        sums = np.array([values[a:b].sum(dtype=np.float64) for a, b in bounds[valid]])
+    means[valid] = sums / counts[valid]
+    for i in np.flatnonzero(valid & np.isnan(means)):
+        means[i] = mean(values[bounds[i, 0]:bounds[i, 1]])
+    return means
+
+
+ROLLING_CHUNK = 1 << 16  # rolling_std 每次处理的点数，临时数组留在 CPU 缓存中
+
+
+def _window_sums(data):
+    """
+    data 是按窗口长度分好的块 (块数, window)。返回 s1、s2：s1[b, r]、s2[b, r] 是以块 b 的第 r 个点结尾的窗口
+    相对于块 b 第一个点的一阶、二阶和；第 0 块前面没有数据，只有 r = window - 1（整块）是有效的。
+    以 (b, r) 结尾的窗口 = 上一块 r + 1 之后的点（以上一块最后一个点为参考的后缀和）
+    + 当前块的前 r + 1 个点（以当前块第一个点为参考的前缀和），临时数组尽量原地计算。
+    """
+    window = data.shape[1]
+    s1 = data - data[:, :1]
+    s2 = np.square(s1)
+    np.cumsum(s1, axis=1, out=s1)
+    np.cumsum(s2, axis=1, out=s2)
+    if len(data) > 1:
+        # 从第 1 到 window - 1 个点开始的后缀和（先倒序累加，再倒序取回）
+        t1 = data[:-1, :0:-1] - data[:-1, -1:]
+        t2 = np.square(t1)
+        np.cumsum(t1, axis=1, out=t1)
+        np.cumsum(t2, axis=1, out=t2)
+        t1, t2 = t1[:, ::-1], t2[:, ::-1]
+        # 后缀换算到当前块的参考点：d 是相邻两个点（上一块最后一个点、当前块第一个点）的差，count 是后缀的点数
+        count = np.arange(window - 1, 0, -1, dtype=np.float64)
+        d = (data[:-1, -1] - data[1:, 0])[:, None]
+        head1, head2 = s1[1:, :-1], s2[1:, :-1]
+        head2 += t2
+        t2 = np.multiply(t1, 2 * d, out=t2)
+        head2 += t2
+        head1 += t1
+        shift = np.multiply(count, d, out=t2)
+        head1 += shift
+        shift *= d
+        head2 += shift
+    return s1, s2
+
+
+def rolling_std(values, window, ddof=1):
+    """
+    滑动窗口标准差，O(n)，结果与 pd.Series(values).rolling(window).std(ddof) 对齐：
+    第 i 个值是以 i 结尾的窗口的标准差，前 window - 1 个为 NaN，窗口中有 NaN 时为 NaN。
+    按窗口长度把数据分块，窗口的和由上一块的后缀和、当前块的前缀和拼成（见 _window_sums），
+    两个参考点都在窗口内且相邻，所有的和都只与窗口内数据的波动有关，与直流偏置（230 V、4 kW 等）和数据总长度无关，
+    不会像整列累积和那样因大数相减损失精度。float32 列按 float64 计算。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window <= ddof or window > n:
+        return result
+    blocks = -(-n // window)
+    full = n // window
+    step = max(1, ROLLING_CHUNK // window)
+    for b0 in range(0, blocks, step):
+        b1 = min(b0 + step, blocks)
+        # 多取前一块，用来拼接跨块的窗口
+        first = max(b0 - 1, 0)
+        if b1 <= full:
+            data = values[first * window:b1 * window].reshape(-1, window)
+        else:
+            # 最后一块不完整，补齐后的点只出现在不会被用到的后缀和中
+            data = np.empty(((b1 - first) * window))
+            data[:n - first * window] = values[first * window:]
+            data[n - first * window:] = values[-1]
+            data = data.reshape(-1, window)
+        s1, s2 = _window_sums(data)
+        begin = max(b0 * window, window - 1)
+        end = min(b1 * window, n)
+        skip = begin - first * window
+        var = s2.ravel()[skip:skip + end - begin]
+        var -= np.square(s1.ravel()[skip:skip + end - begin]) / window
+        var /= window - ddof
+        np.maximum(var, 0.0, out=var)
+        np.sqrt(var, out=result[begin:end])
+    return result
+
+
+def run_starts(indices, gap):
+    """
+    只保留每段连续索引的起点：第一个索引，以及与前一个索引相差超过 gap 的索引（按原始的前一个索引比较）。
+    indices 是升序的整数数组，返回 numpy 索引数组。
+    """
+    indices = np.asarray(indices)
+    if not len(indices):
+        return indices
+    keep = np.empty(len(indices), dtype=bool)
+    keep[0] = True
+    np.greater(np.diff(indices), gap, out=keep[1:])
+    return indices[keep]
+
+
+def _sliding_max(values, window):
+    """
+    r[i] = max(values[i:i + window])，O(n)：按窗口长度分块，由块内的后缀最大值和下一块的前缀最大值拼成。
+    后缀最大值在倒序拷贝上累积（倒序视图上的 accumulate 很慢）。
+    """
+    n = len(values)
+    blocks = -(-n // window)
+    data = np.full(blocks * window, -np.inf)
+    data[:n] = values
+    prefix = np.maximum.accumulate(data.reshape(blocks, window), axis=1).ravel()
+    reverse = np.ascontiguousarray(data[::-1]).reshape(blocks, window)
+    suffix = np.maximum.accumulate(reverse, axis=1, out=reverse).ravel()[::-1]
+    # 倒序拷贝的分块从末尾开始，补齐的部分在开头，整体倒回来后与正序的分块对齐
+    return np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+
+
+def jump_count_curve(stds, window):
+    """
+    突变点个数随阈值变化的阶梯函数，一次算出所有阈值。
+    位置 p 在阈值 t 下是一段突变的起点，当且仅当 stds[p] > t，且前 window 个位置都不超过 t，
+    即 t ∈ [前 window 个位置的最大值, stds[p])（NaN 视为不超过任何阈值）。
+    返回两个升序数组 (lower, upper)，阈值 t 下的突变点个数 =
+    searchsorted(lower, t, 'right') - searchsorted(upper, t, 'right')，
+    与 len(run_starts(flatnonzero(stds > t), window)) 一致。
+    window < 1 时（与 pandas rolling(0) 一样滑动标准差全是 NaN）任何阈值下都没有突变点，返回空曲线。
+    """
+    if not len(stds) or window < 1:
+        return np.empty(0), np.empty(0)
+    stds = np.nan_to_num(stds, nan=-np.inf)
+    # 每个位置之前 window 个位置的最大值：p >= window 时是从 p - window 开始的窗口最大值，开头不足 window 个时取前缀最大值
+    previous = np.empty(len(stds))
+    head = min(window, len(stds))
+    previous[0] = -np.inf
+    np.maximum.accumulate(stds[:head - 1], out=previous[1:head])
+    if len(stds) > window:
+        previous[window:] = _sliding_max(stds[:-1], window)
+    starts = previous < stds
+    return np.sort(previous[starts]), np.sort(stds[starts])
+
+
+def jump_counts(stds, window, thresholds):
+    """滑动标准差 stds 在每个阈值下检测到的突变点个数"""
+    lower, upper = jump_count_curve(stds, window)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return np.searchsorted(lower, thresholds, 'right') - np.searchsorted(upper, thresholds, 'right')
+
+
+def plateaus(thresholds, counts, end, limit=3, min_width=0.05):
+    """
+    阶梯函数（thresholds[i] 起到下一个断点之前个数为 counts[i]，最后一段到 end 为止）中最宽的几段平台，
+    只取有突变点、宽度不小于整个范围 min_width 的段，返回 [(起点, 终点, 个数)]，按宽度从大到小排列。
+    """
+    if not len(thresholds):
+        return []
+    ends = np.append(thresholds[1:], end)
+    widths = ends - thresholds
+    candidates = np.flatnonzero((counts > 0) & (widths >= min_width * (end - thresholds[0])))
+    order = candidates[np.argsort(-widths[candidates], kind='stable')][:limit]
+    return [(float(thresholds[i]), float(ends[i]), int(counts[i])) for i in order]
+
+
+class RangeMaxMin:
+    """
+    区间最大值/最小值查询索引。建立时把列按 block 个点分块，记下每块的最大值、最小值及其位置，
+    再在块上建稀疏表（第 k 层是从每一块开始连续 2^k 块的结果）。
+    query(a, b) 与 max_min(values[a:b], a) 结果一致：中间的整块 O(1) 查稀疏表，两端不满一块的部分直接扫描，
+    与区间长度无关；拖动参考线时不再扫描整个区间。索引只占 O(n / block · log) 的内存。
+    """
+    BLOCK = 1024
+
+    def __init__(self, values, block=BLOCK):
+        self.values = values
+        self.block = block
+        self.blocks = len(values) // block
+        rows = values[:self.blocks * block].reshape(self.blocks, block)
+        self.max_levels = [self._block_extrema(rows, np.argmax, np.nanargmax, -np.inf)]
+        self.min_levels = [self._block_extrema(rows, np.argmin, np.nanargmin, np.inf)]
+        span = 1
+        while 2 * span <= self.blocks:
+            self.max_levels.append(self._merge(self.max_levels[-1], span, np.greater_equal))
+            self.min_levels.append(self._merge(self.min_levels[-1], span, np.less_equal))
+            span *= 2
+
+    def _block_extrema(self, rows, arg, nanarg, empty):
+        """每块的 (值, 全局位置)，忽略 NaN；全是 NaN 的块值记为 empty（±inf）"""
+        index = arg(rows, axis=1)
+        value = rows[np.arange(len(rows)), index].astype(np.float64)
+        for i in np.flatnonzero(np.isnan(value)):
+            if np.isnan(rows[i]).all():
+                value[i] = empty
+            else:
+                index[i] = nanarg(rows[i])
+                value[i] = rows[i, index[i]]
+        return value, index + np.arange(len(rows)) * self.block
+
+    @staticmethod
+    def _merge(level, span, prefer_left):
+        """由上一层得到长度翻倍的一层：相等时取左边（更早出现的位置）"""
+        value, index = level
+        left, right = slice(None, len(value) - span), slice(span, None)
+        take_left = prefer_left(value[left], value[right])
+        return np.where(take_left, value[left], value[right]), np.where(take_left, index[left], index[right])
+
+    def _blocks_query(self, levels, first, last, better):
+        """整块 [first, last) 的结果：两段长度为 2^k 的重叠区间，相等时取位置更早的"""
+        k = (last - first).bit_length() - 1
+        value, index = levels[k]
+        i, j = first, last - (1 << k)
+        if better(value[j], value[i]) or (value[j] == value[i] and index[j] < index[i]):
+            return value[j], index[j]
+        return value[i], index[i]
+
+    def query(self, a, b):
+        """返回 (最大值, 最大值索引, 最小值, 最小值索引)，与 max_min(values[a:b], a) 一致"""
+        start, stop = slice(a, b).indices(len(self.values))[:2]
+        first = -(-start // self.block)
+        last = min(stop // self.block, self.blocks)
+        if first >= last:
+            return max_min(self.values[start:stop], start)
+        parts = [max_min(self.values[start:first * self.block], start)]
+        max_value, max_index = self._blocks_query(self.max_levels, first, last, np.greater)
+        min_value, min_index = self._blocks_query(self.min_levels, first, last, np.less)
+        # 全是 NaN 的整块不参与比较
+        parts.append((max_value, max_index, min_value, min_index) if not np.isnan(self.values[max_index])
+                     else (np.nan, np.nan, np.nan, np.nan))
+        parts.append(max_min(self.values[last * self.block:stop], last * self.block))
+        # 按位置先后合并，严格大于/小于才替换，保证取第一次出现的位置
+        result = [np.nan, np.nan, np.nan, np.nan]
+        for part in parts:
+            if np.isnan(part[0]):
+                continue
+            if np.isnan(result[0]) or part[0] > result[0]:
+                result[0], result[1] = part[0], part[1]
+            if np.isnan(result[2]) or part[2] < result[2]:
+                result[2], result[3] = part[2], part[3]
+        if np.isnan(result[0]):
+            return (np.nan, np.nan, np.nan, np.nan)
+        return (np.float64(result[0]), int(result[1]), np.float64(result[2]), int(result[3]))
+
+
+class StreamStats:
+    """
+    分块累积多列的统计量：均值、最大值及其索引、最小值及其索引，忽略 NaN。
+    moments=True 时还累积标准差（样本标准差，ddof=1）和均方根，
+    标准差按块合并二阶中心矩（Chan 的并行算法），数据带有很大直流偏置时也不会损失精度。
+    每次 update 传入一个 (行数, 列数) 的数据块，块按行顺序依次传入，
+    内存占用只和块大小有关，与数据总行数无关。
+    """
+    def __init__(self, n_columns, moments=False):
+        self.moments = moments
+        self.rows = 0
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.total = np.zeros(n_columns)
+        self.max = np.full(n_columns, -np.inf)
+        self.max_index = np.full(n_columns, -1, dtype=np.int64)
+        self.min = np.full(n_columns, np.inf)
+        self.min_index = np.full(n_columns, -1, dtype=np.int64)
+        if moments:
+            self.square_total = np.zeros(n_columns)
+            self.m2 = np.zeros(n_columns)
+
+    def update(self, block: np.ndarray):
+        if not len(block):
+            return
+        # float32 的数据块也按 float64 累加
+        block = np.asarray(block, dtype=np.float64)
+        columns = np.arange(block.shape[1])
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        zeroed = np.where(valid, block, 0.0)
+        total = zeroed.sum(axis=0)
+        if self.moments:
+            self._update_moments(block, valid, count, total, zeroed)
+        self.count += count
+        self.total += total
+        # NaN 换成 ±inf 后再取 argmax/argmin；严格大于/小于才更新，保证取第一次出现的位置
+        filled = np.where(valid, block, -np.inf)
+        index = filled.argmax(axis=0)
+        value = filled[index, columns]
+        better = value > self.max
+        self.max[better] = value[better]
+        self.max_index[better] = self.rows + index[better]
+        filled = np.where(valid, block, np.inf)
+        index = filled.argmin(axis=0)
+        value = filled[index, columns]
+        better = value < self.min
+        self.min[better] = value[better]
+        self.min_index[better] = self.rows + index[better]
+        self.rows += len(block)
+
+    def _update_moments(self, block, valid, count, total, zeroed):
+        """把当前块的二阶中心矩合并到累计值中（在更新 count/total 之前调用）"""
+        self.square_total += (zeroed * zeroed).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block_mean = np.where(count > 0, total / count, 0.0)
+            block_m2 = (np.where(valid, block - block_mean, 0.0) ** 2).sum(axis=0)
+            old_mean = np.where(self.count > 0, self.total / self.count, 0.0)
+            merged = self.count + count
+            delta = block_mean - old_mean
+            correction = np.where(merged > 0, delta * delta * self.count * count / merged, 0.0)
+        self.m2 += block_m2 + correction
+
+    def mean(self, i):
+        return self.total[i] / self.count[i] if self.count[i] else np.nan
+
+    def max_min(self, i):
+        """与 max_min 的返回格式一致：(最大值, 最大值索引, 最小值, 最小值索引)"""
+        if self.max_index[i] < 0:
+            return (np.nan, np.nan, np.nan, np.nan)
+        return (self.max[i], int(self.max_index[i]), self.min[i], int(self.min_index[i]))
+
+    def std(self, i):
+        return np.sqrt(self.m2[i] / (self.count[i] - 1)) if self.count[i] > 1 else np.nan
+
+    def rms(self, i):
+        return np.sqrt(self.square_total[i] / self.count[i]) if self.count[i] else np.nan
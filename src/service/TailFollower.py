@@ -0,0 +1,106 @@
+# TailFollower.py
+# 跟踪仪器仍在写入的 CSV 文件：定时检查文件是否变长，只解析新追加的字节
+import os
+import time
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QMainWindow
+from service import CsvReader
+from service.CsvLoader import LoadOptions
+
+
+class TailFollower:
+    """
+    跟踪模式：每隔 interval 毫秒检查一次当前文件，新追加的完整行被解析后追加到内存中的列，
+    再交给 Draw.append_rows 增量检测突变点、更新参考线和表格。
+    刷新频率由定时器间隔限定，每次最多解析 max_bytes 字节，积压的数据在之后的几次刷新中补上，界面不会卡住。
+    不会调用 FileManager.clear，用户选择的变量、参考线和斜率线都保持不变。
+    """
+    POLL_INTERVAL = 1000
+    MAX_POLL_BYTES = 16 << 20
+
+    def __init__(self, main_window: QMainWindow, interval=POLL_INTERVAL, max_bytes=MAX_POLL_BYTES):
+        self.main_window = main_window
+        self.max_bytes = max_bytes
+        self.csv_path = None
+        self.schema = None
+        self.store = None
+        self.options = None
+        self.offset = 0
+        self.rows_added = 0
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self._poll)
+
+    @property
+    def running(self) -> bool:
+        return self.timer.isActive()
+
+    def start(self, csv_path, schema, store, options: LoadOptions) -> bool:
+        """开始跟踪 csv_path，store 是该文件当前的 ColumnStore；无法跟踪时返回 False"""
+        self.stop()
+        if store is None or schema is None:
+            self.main_window.msg("未加载文件，无法跟踪")
+            return False
+        if CsvReader.split_source(csv_path)[1] is not None:
+            self.main_window.msg("压缩包中的文件不会再被写入，无需跟踪")
+            return False
+        t0 = time.perf_counter()
+        # 找到已加载的行在文件中结束的位置，之后从这里开始读新行
+        rows, self.offset = CsvReader.locate_row_end(csv_path, schema.header_offset, len(store))
+        self.csv_path = csv_path
+        self.schema = schema
+        self.store = store
+        self.options = options
+        self.rows_added = 0
+        # 文件会继续变长，之后才加载的列直接从文件解析（不使用按文件大小建立的磁盘缓存），按当前行数截取
+        positions = dict(zip(schema.numeric_columns, schema.numeric))
+        store.set_loader(lambda name: CsvReader.read_column(csv_path, schema, positions[name],
+                                                            options.engine).astype(options.dtype, copy=False),
+                         lambda: CsvReader.read_timestamps(csv_path, schema))
+        if rows < len(store):
+            # 最后一行加载时还没写完，丢掉它，等写完后重新解析
+            store.truncate(rows)
+        self.timer.start()
+        self.main_window.msg(f"开始跟踪文件 {csv_path}，已有 {rows} 行，"
+                             f"定位耗时：{(time.perf_counter() - t0) * 1000:.1f} ms")
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.timer.stop()
+        self.main_window.msg(f"停止跟踪文件 {self.csv_path}，共追加 {self.rows_added} 行")
+        self.store = None
+        # 文件被截断、删除时也会停止，同步菜单的勾选状态
+        self.main_window.action_follow.setChecked(False)
+
+    def _poll(self):
+        try:
+            size = os.path.getsize(self.csv_path)
+        except OSError:
+            self.stop()
+            return
+        if size < self.offset:
+            self.main_window.msg(f"文件 {self.csv_path} 变短了（被截断或替换），请重新导入")
+            self.stop()
+            return
+        if size == self.offset:
+            return
+        positions = dict(zip(self.schema.numeric_columns, self.schema.numeric))
+        loaded = self.store.loaded
+        values, timestamps, offset = CsvReader.read_appended(self.csv_path,
+                                                             self.schema,
+                                                             self.offset,
+                                                             [positions[name] for name in loaded],
+                                                             self.options.engine,
+                                                             timestamps=self.store.timestamps_loaded,
+                                                             max_bytes=self.max_bytes)
+        self.offset = offset
+        added = len(next(iter(values.values()))) if values else 0
+        if added == 0:
+            return
+        start = len(self.store)
+        self.store.append({name: values[positions[name]].astype(self.options.dtype, copy=False) for name in loaded},
+                          timestamps)
+        self.rows_added += added
+        self.main_window.draw.append_rows(start)
@@ -0,0 +1,25 @@
+# 测试共用的工具：把 src 加入 sys.path，生成测试信号，创建不带界面的 DataAnalysis。
+# pytest 会自动加载本文件；直接用 python 运行测试脚本时由脚本 import（脚本所在目录在 sys.path 中）。
+import os
+import sys
+from types import SimpleNamespace
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from service.ColumnStore import ColumnStore
+from service.DataAnalysis import DataAnalysis
+
+
+def noisy_steps(rng, n, noise=None):
+    """每 50 个点一级的阶跃信号（0 / 230 / 4000）加高斯噪声，noise 为噪声标准差，不给时随机取一种"""
+    values = np.repeat(rng.choice([0.0, 230.0, 4000.0], size=n // 50 + 1), 50)[:n]
+    if noise is None:
+        noise = rng.choice([0.01, 1.0, 5.0])
+    return values + rng.normal(0, noise, n)
+
+
+def make_analysis(columns: dict) -> DataAnalysis:
+    """不带界面的 DataAnalysis，数据为 {列名: 数组}"""
+    analysis = DataAnalysis(SimpleNamespace(main_ui=None))
+    analysis.set_table_data(ColumnStore(list(columns), columns))
+    return analysis
@@ -0,0 +1,94 @@
+# 稳定区间均值的回归测试：Stats.interval_means 与原来逐个区间的 pd.Series(v)[a:b].mean() 一致
+# （包括空区间、无序或重叠的区间、含 NaN 和全是 NaN 的区间）。
+# np.add.reduceat 的累加顺序与 pandas 不完全相同，允许几个 ulp 的舍入误差（相对区间内 |v| 的均值）。
+# 用法：python test/test_interval_means.py 或 python -m pytest test/test_interval_means.py
+import numpy as np
+import pandas as pd
+
+from conftest import make_analysis
+from service import Stats
+
+
+def pandas_means(values, intervals):
+    """原来 cal_avg 中的实现"""
+    series = pd.Series(values)
+    return np.array([series[a:b].mean() for a, b in intervals], dtype=np.float64)
+
+
+def assert_means_equal(means, values, intervals):
+    expected = pandas_means(values, intervals)
+    assert np.shape(means) == (len(intervals),)
+    assert (np.isnan(means) == np.isnan(expected)).all()
+    # 舍入误差的量级由区间内 |v| 的均值决定，均值接近 0 时相对误差没有意义
+    scale = pandas_means(np.abs(values), intervals)
+    assert (np.abs(np.subtract(means, expected)) <= 4 * np.finfo(np.float64).eps * scale)[~np.isnan(expected)].all()
+
+
+def check(values, intervals):
+    assert_means_equal(Stats.interval_means(values, intervals), values, intervals)
+
+
+def sorted_intervals(rng, n, count):
+    edges = np.sort(rng.integers(0, n + 1, 2 * count))
+    return [(int(a), int(b)) for a, b in zip(edges[::2], edges[1::2])]
+
+
+def test_ordered_intervals():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        n = int(rng.integers(1, 5000))
+        # 带直流偏置的信号，最容易暴露累加误差
+        values = 230.0 + rng.normal(0, 1.0, n)
+        check(values, sorted_intervals(rng, n, int(rng.integers(0, 30))))
+
+
+def test_empty_and_out_of_range():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=1000)
+    check(values, [])
+    check(values, [(5, 5), (10, 3), (2000, 3000)])
+    check(values, [(0, 10), (10, 10), (10, 20), (990, 1200)])
+    check(values, [(-100, -10), (-10, None), (None, 5)])
+
+
+def test_unordered_and_overlapping():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=3000)
+    check(values, [(500, 800), (0, 100), (700, 900), (50, 60)])
+    for _ in range(50):
+        intervals = sorted_intervals(rng, len(values), 10)
+        rng.shuffle(intervals)
+        check(values, intervals)
+
+
+def test_nan_intervals():
+    rng = np.random.default_rng(3)
+    values = 230.0 + rng.normal(size=4000)
+    values[rng.integers(0, len(values), 40)] = np.nan
+    values[1000:1200] = np.nan
+    check(values, [(0, 500), (1000, 1200), (1100, 1300), (1300, 4000)])
+    for _ in range(50):
+        check(values, sorted_intervals(rng, len(values), 15))
+    check(np.full(100, np.nan), [(0, 50), (50, 100)])
+
+
+def test_cal_avg_matches_pandas():
+    rng = np.random.default_rng(4)
+    n = 5000
+    columns = {name: rng.normal(size=n) * scale for name, scale in (("a", 1.0), ("b", 230.0), ("c", 4000.0))}
+    columns["b"][100:300] = np.nan
+    analysis = make_analysis(columns)
+    intervals = sorted_intervals(rng, n, 20)
+    analysis.set_stable_interval("a", intervals)
+    analysis.cal_avg("a", list(columns))
+    for name, values in columns.items():
+        assert_means_equal(analysis.data_avg[name], values, intervals)
+
+
+if __name__ == "__main__":
+    test_ordered_intervals()
+    test_empty_and_out_of_range()
+    test_unordered_and_overlapping()
+    test_nan_intervals()
+    test_cal_avg_matches_pandas()
+    print("ok")
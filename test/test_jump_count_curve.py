@@ -0,0 +1,90 @@
+# 阈值曲线的回归测试：Stats.jump_count_curve 给出的突变点个数与逐个阈值检测
+# len(run_starts(flatnonzero(stds > t), window)) 一致（包括 NaN、相等的标准差和恰好等于阈值的情况）
+# 用法：python test/test_jump_count_curve.py 或 python -m pytest test/test_jump_count_curve.py
+import numpy as np
+
+from conftest import make_analysis, noisy_steps
+from service import Stats
+
+
+def detect_count(stds, window, threshold):
+    return len(Stats.run_starts(np.flatnonzero(stds > threshold), window))
+
+
+def check_curve(stds, window):
+    lower, upper = Stats.jump_count_curve(stds, window)
+    finite = np.unique(stds[~np.isnan(stds)])
+    # 所有断点本身、断点之间和两端之外的阈值
+    thresholds = np.concatenate((finite, (finite[1:] + finite[:-1]) / 2, [-1.0, 0.0, np.inf]))
+    if len(finite):
+        thresholds = np.append(thresholds, [finite[0] - 1, finite[-1] + 1])
+    counts = Stats.jump_counts(stds, window, thresholds)
+    for threshold, count in zip(thresholds, counts):
+        assert count == detect_count(stds, window, threshold), (window, threshold)
+        assert count == (np.searchsorted(lower, threshold, 'right') - np.searchsorted(upper, threshold, 'right'))
+
+
+def test_random_stds():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(0, 400))
+        window = int(rng.integers(1, 40))
+        check_curve(rng.exponential(size=n), window)
+
+
+def test_ties():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        # 只有几种取值：大量相等的标准差，阈值恰好等于其中的值
+        stds = rng.integers(0, 4, int(rng.integers(1, 300))).astype(np.float64)
+        check_curve(stds, int(rng.integers(1, 30)))
+    check_curve(np.zeros(100), 5)
+    check_curve(np.full(100, 2.0), 5)
+
+
+def test_nan_blocks():
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        n = int(rng.integers(1, 400))
+        window = int(rng.integers(1, 40))
+        stds = rng.exponential(size=n)
+        stds[rng.random(n) < 0.05] = np.nan
+        a = int(rng.integers(0, n))
+        stds[a:a + int(rng.integers(0, 3 * window))] = np.nan
+        check_curve(stds, window)
+    check_curve(np.full(50, np.nan), 4)
+
+
+def test_threshold_curve_matches_detect():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        n = int(rng.integers(300, 3000))
+        values = noisy_steps(rng, n, noise=1.0)
+        values[rng.random(n) < 0.01] = np.nan
+        analysis = make_analysis({"v": values})
+        window = int(rng.integers(2, 100))
+        thresholds, counts = analysis.threshold_curve("v", window, 0.0, 100.0)
+        assert thresholds[0] == 0.0 and (np.diff(thresholds) > 0).all()
+        for threshold, count in zip(thresholds, counts):
+            assert count == len(analysis.pandas_detect_jumps("v", window, threshold))
+
+
+def test_window_zero():
+    # spinBox_3 的最小值是 0：与 pandas rolling(0) 一样检测不到突变点，不能抛出异常
+    lower, upper = Stats.jump_count_curve(np.random.default_rng(4).exponential(size=100), 0)
+    assert len(lower) == len(upper) == 0
+    values = np.repeat([0.0, 230.0, 4000.0], 100) + np.random.default_rng(5).normal(0, 1.0, 300)
+    analysis = make_analysis({"v": values})
+    thresholds, counts = analysis.threshold_curve("v", 0, 0.0, 100.0)
+    assert thresholds.tolist() == [0.0] and counts.tolist() == [0]
+    assert analysis.pandas_detect_jumps("v", 0, 0.0) == []
+    assert analysis.jump_count_grid("v", [0], [0.0, 1.0]).tolist() == [[0, 0]]
+
+
+if __name__ == "__main__":
+    test_random_stds()
+    test_ties()
+    test_nan_blocks()
+    test_threshold_curve_matches_detect()
+    test_window_zero()
+    print("ok")
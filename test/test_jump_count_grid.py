@@ -0,0 +1,72 @@
+# 灵敏度图的回归测试：DataAnalysis.jump_count_grid 的每一格与按该窗口、该阈值实际检测到的突变点个数一致
+# 用法：python test/test_jump_count_grid.py 或 python -m pytest test/test_jump_count_grid.py
+import numpy as np
+
+from conftest import make_analysis, noisy_steps
+from service import DataAnalysis as DataAnalysisModule
+
+
+def check_grid(analysis, key, windows, thresholds):
+    grid = analysis.jump_count_grid(key, windows, thresholds)
+    assert grid.shape == (len(windows), len(thresholds))
+    for i, window in enumerate(windows):
+        for j, threshold in enumerate(thresholds):
+            assert grid[i, j] == len(analysis.pandas_detect_jumps(key, int(window), float(threshold)))
+
+
+def test_grid_matches_detect():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = int(rng.integers(300, 4000))
+        analysis = make_analysis({"v": noisy_steps(rng, n)})
+        windows = np.unique(rng.integers(2, 120, 5))
+        thresholds = np.concatenate(([0.0], np.sort(rng.choice([0.005, 0.02, 0.5, 3.0, 50.0, 1e4], 4))))
+        check_grid(analysis, "v", windows, thresholds)
+
+
+def test_grid_nan_and_ties():
+    rng = np.random.default_rng(1)
+    values = noisy_steps(rng, 2000)
+    values[300:340] = np.nan
+    values[1000] = np.nan
+    # 一段常数：滑动标准差恰好为 0，阈值 0 不算突变
+    values[1500:1700] = 230.0
+    analysis = make_analysis({"v": values})
+    windows = [2, 5, 30, 100]
+    # 阈值取滑动标准差中实际出现的值，检验 “大于” 而不是 “大于等于”
+    stds = analysis.get_rolling_std("v", 30)
+    thresholds = [0.0] + list(np.unique(stds[~np.isnan(stds)])[::97][:8])
+    check_grid(analysis, "v", windows, thresholds)
+
+
+def test_window_cache_is_bounded_by_bytes():
+    rng = np.random.default_rng(2)
+    analysis = make_analysis({"v": noisy_steps(rng, 1000)})
+    cache_bytes = DataAnalysisModule.ROLLING_STD_CACHE_BYTES
+    try:
+        # 每组滑动标准差 8000 字节，缓存放得下 3 组
+        DataAnalysisModule.ROLLING_STD_CACHE_BYTES = 3 * 8000
+        first = analysis.get_rolling_std("v", 10)
+        analysis.get_rolling_std("v", 11)
+        analysis.get_rolling_std("v", 12)
+        # 调回之前用过的窗口直接取缓存
+        assert analysis.get_rolling_std("v", 10) is first
+        analysis.get_rolling_std("v", 13)
+        assert list(analysis._rolling_std) == [("v", 12), ("v", 10), ("v", 13)]
+        # 阈值曲线也计入缓存大小
+        analysis.threshold_curve("v", 13, 0.0, 1.0)
+        assert sum(analysis._cached_bytes(key) for key in analysis._rolling_std) <= 3 * 8000
+        assert ("v", 13) in analysis._jump_curve
+        # 一组都放不下时只保留当前窗口
+        DataAnalysisModule.ROLLING_STD_CACHE_BYTES = 1000
+        analysis.get_rolling_std("v", 14)
+        assert list(analysis._rolling_std) == [("v", 14)] and not analysis._jump_curve
+    finally:
+        DataAnalysisModule.ROLLING_STD_CACHE_BYTES = cache_bytes
+
+
+if __name__ == "__main__":
+    test_grid_matches_detect()
+    test_grid_nan_and_ties()
+    test_window_cache_is_bounded_by_bytes()
+    print("ok")
@@ -0,0 +1,67 @@
+# 区间最大/最小值查询索引的回归测试：Stats.RangeMaxMin.query(a, b) 与 Stats.max_min(values[a:b], a) 结果一致
+# （包括相等值取第一次出现的位置、部分或整块为 NaN 的情况）
+# 用法：python test/test_range_max_min.py 或 python -m pytest test/test_range_max_min.py
+import numpy as np
+
+import conftest  # 把 src 加入 sys.path
+from service import Stats
+
+
+def same(result, expected):
+    """逐项比较 (最大值, 最大值索引, 最小值, 最小值索引)，NaN 与 NaN 视为相同"""
+    return all((np.isnan(x) and np.isnan(y)) if np.isnan(y) else x == y for x, y in zip(result, expected))
+
+
+def check_queries(rng, values, block, count=300):
+    index = Stats.RangeMaxMin(values, block)
+    n = len(values)
+    for _ in range(count):
+        a, b = sorted(rng.integers(0, n + 1, 2))
+        assert same(index.query(a, b), Stats.max_min(values[a:b], a)), (block, a, b)
+    # 切片规则：负数下标、越界和空区间
+    for a, b in [(0, n), (0, None), (-block - 3, None), (5, 5), (n - 1, n + 10), (block, 2 * block)]:
+        start = slice(a, b).indices(n)[0]
+        assert same(index.query(a, b), Stats.max_min(values[a:b], start)), (block, a, b)
+
+
+def test_random_values():
+    rng = np.random.default_rng(0)
+    for block in (1, 4, 16, Stats.RangeMaxMin.BLOCK):
+        values = rng.normal(size=int(rng.integers(block * 3, block * 40)))
+        check_queries(rng, values, block)
+
+
+def test_ties():
+    rng = np.random.default_rng(1)
+    for block in (4, 16, 64):
+        # 只有几种取值，每个区间内都有很多相等的最大/最小值
+        values = rng.integers(0, 3, block * 37).astype(np.float64)
+        check_queries(rng, values, block)
+        check_queries(rng, np.full(block * 9, 7.0), block)
+
+
+def test_nan_blocks():
+    rng = np.random.default_rng(2)
+    for block in (4, 16, 64):
+        values = rng.normal(size=block * 30)
+        # 零星的 NaN、整块 NaN、跨块的一段 NaN
+        values[rng.integers(0, len(values), block)] = np.nan
+        values[3 * block:4 * block] = np.nan
+        values[10 * block - 2:13 * block + 3] = np.nan
+        check_queries(rng, values, block)
+        assert same(Stats.RangeMaxMin(values, block).query(3 * block, 4 * block), (np.nan,) * 4)
+    check_queries(rng, np.full(200, np.nan), 8)
+
+
+def test_float32():
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=5000).astype(np.float32)
+    check_queries(rng, values, 32)
+
+
+if __name__ == "__main__":
+    test_random_values()
+    test_ties()
+    test_nan_blocks()
+    test_float32()
+    print("ok")
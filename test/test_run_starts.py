@@ -0,0 +1,65 @@
+# 突变点去连续点（只保留每段的起点）的回归测试：向量化的 Stats.run_starts 与原来的逐点循环结果一致
+# 用法：python test/test_run_starts.py 或 python -m pytest test/test_run_starts.py
+import numpy as np
+
+from conftest import make_analysis, noisy_steps
+from service import Stats
+
+
+def loop_run_starts(jumps, window):
+    """原来 detect_jumps / pandas_detect_jumps 中的实现"""
+    jumps = list(jumps)
+    if len(jumps) == 0:
+        return []
+    clean_jumps = [jumps[0]]
+    for i in range(1, len(jumps)):
+        if jumps[i] - jumps[i - 1] > window:
+            clean_jumps.append(jumps[i])
+    return clean_jumps
+
+
+def loop_detect(values, window, threshold, start=0, ddof=1):
+    """原来的检测流程（标准差统一用 Stats.rolling_std），start 之前的突变点不返回"""
+    stds = Stats.rolling_std(values, window, ddof)
+    if ddof == 0:
+        stds = stds[window - 1:]
+    jumps = np.flatnonzero(stds > threshold).tolist()
+    return [jump for jump in loop_run_starts(jumps, window) if jump >= start]
+
+
+def test_run_starts_random():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        jumps = np.unique(rng.integers(0, 5000, rng.integers(0, 400)))
+        window = int(rng.integers(1, 80))
+        assert Stats.run_starts(jumps, window).tolist() == loop_run_starts(jumps, window)
+
+
+def test_run_starts_edge_cases():
+    assert Stats.run_starts(np.array([], dtype=np.int64), 5).tolist() == []
+    assert Stats.run_starts(np.array([7]), 5).tolist() == [7]
+    # 相差正好等于 window 的点不是新的起点，只和前一个原始索引比较
+    assert Stats.run_starts(np.array([0, 5, 10, 16, 17, 30]), 5).tolist() == [0, 16, 30]
+
+
+def test_detectors_match_loop():
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        n = int(rng.integers(200, 5000))
+        values = noisy_steps(rng, n)
+        analysis = make_analysis({"v": values})
+        window = int(rng.integers(2, 100))
+        threshold = float(rng.choice([0.005, 0.02, 0.5, 3.0, 50.0]))
+        expected = loop_detect(values, window, threshold)
+        assert analysis.pandas_detect_jumps("v", window, threshold) == expected
+        assert analysis.detect_jumps("v", window, threshold) == loop_detect(values, window, threshold, ddof=0)
+        # 跟踪文件追加时的增量检测
+        start = int(rng.integers(0, n))
+        assert analysis.pandas_detect_jumps("v", window, threshold, start) == [j for j in expected if j >= start]
+
+
+if __name__ == "__main__":
+    test_run_starts_random()
+    test_run_starts_edge_cases()
+    test_detectors_match_loop()
+    print("ok")